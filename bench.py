@@ -0,0 +1,378 @@
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import random
+import shutil
+import struct
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import ssd
+
+SIZES = {
+    "small": dict(scenes=50, entries=50, scene_size=4 * 1024, entry_size=16 * 1024),
+    "medium": dict(scenes=500, entries=400, scene_size=8 * 1024, entry_size=32 * 1024),
+    "large": dict(scenes=2000, entries=1500, scene_size=16 * 1024, entry_size=64 * 1024),
+}
+
+def lzss_compress(data: bytes) -> bytes:
+    out = bytearray(struct.pack("<II", 0, len(data)))
+    n = len(data)
+    last = {}
+    i = 0
+    while i < n:
+        fpos = len(out)
+        out.append(0)
+        flags = 0
+        for bit in range(8):
+            if i >= n:
+                break
+            best = 0
+            j = last.get(data[i:i + 2]) if i + 1 < n else None
+            if j is not None and 0 < i - j <= 0xFFF:
+                while best < 17 and i + best < n and data[j + best] == data[i + best]:
+                    best += 1
+            if best >= 2:
+                out += struct.pack("<H", ((i - j) << 4) | (best - 2))
+                for k in range(i, i + best):
+                    last[data[k:k + 2]] = k
+                i += best
+            else:
+                flags |= 1 << bit
+                out.append(data[i])
+                last[data[i:i + 2]] = i
+                i += 1
+        out[fpos] = flags
+    return bytes(out)
+
+def encrypt_resource(name: str, payload: bytes, rnd: random.Random) -> bytes:
+    comp = bytearray(lzss_compress(payload))
+    cs = len(comp)
+    ssd.xor_decrypt_inplace(comp, ssd.TABLE_DF70, 173, cs)
+    header = [rnd.randrange(1 << 32) for _ in range(19)]
+    fn = bytearray(name.encode("utf-16-le"))
+    header[17] = cs
+    header[18] = len(fn)
+    mask_width = header[6] % 16 + 16
+    mask_height = header[9] % 16 + 16
+    block_width = header[10] % 32 + 32
+    half_size = (cs + 1) // 2
+    block_height = (block_width + (half_size + 3) // 4 - 1) // block_width
+    total_size = 4 * block_width * block_height
+    buf1 = bytearray(total_size)
+    buf2 = bytearray(total_size)
+    buf1[:half_size] = comp[:half_size]
+    buf2[:cs - half_size] = comp[half_size:]
+    mask = ssd._resource_mask(header, mask_width, mask_height)
+    hi, lo = ssd._mask_plan(mask, mask_width, mask_height, block_width, block_height)
+    b1 = int.from_bytes(buf1, "little")
+    b2 = int.from_bytes(buf2, "little")
+    src1 = ((b1 & hi) | (b2 & lo)).to_bytes(total_size, "little")
+    src2 = ((b2 & hi) | (b1 & lo)).to_bytes(total_size, "little")
+    ssd.xor_decrypt_inplace(fn, ssd.TABLE_DC70, 59, len(fn))
+    block = bytearray(struct.pack("<19I", *header)) + fn + src1 + src2
+    ssd.xor_decrypt_inplace(block, ssd.TABLE_DD70, 13, len(block))
+    return bytes(block)
+
+def _text(rnd: random.Random, size: int) -> bytes:
+    words = [b"mes ", b"sel ", b"koe(", b"),\r\n", b"\x00\x00\x00\x00", b"farcall ", bytes(rnd.randrange(256) for _ in range(6))]
+    out = bytearray()
+    while len(out) < size:
+        out += rnd.choice(words)
+    return bytes(out[:size])
+
+def _strtab(names):
+    idx = bytearray()
+    pool = bytearray()
+    o = 0
+    for s in names:
+        idx += struct.pack("<2i", o, len(s))
+        pool += s.encode("utf-16-le")
+        o += len(s)
+    return bytes(idx), bytes(pool)
+
+def make_pck(path: str, scenes: int = 50, entries: int = 50, scene_size: int = 4096, entry_size: int = 16384, seed: int = 1) -> int:
+    rnd = random.Random(seed)
+    body = bytearray(92)
+    h = [0] * 23
+    h[0] = 92
+
+    def put(b):
+        o = len(body)
+        body.extend(b)
+        return o
+
+    pidx, ppool = _strtab(["prop_a", "prop_b"])
+    h[1], h[2] = put(struct.pack("<4i", 0, 0, 1, 0)), 2
+    h[3], h[4] = put(pidx), 2
+    h[5], h[6] = put(ppool), 2
+    cidx, cpool = _strtab(["cmd_a", "cmd_b", "cmd_c"])
+    h[7], h[8] = put(struct.pack("<6i", 0, 1, 0, 2, 0, 3)), 3
+    h[9], h[10] = put(cidx), 3
+    h[11], h[12] = put(cpool), 3
+    sidx, spool = _strtab([f"scene{i:05d}" for i in range(scenes)])
+    h[13], h[14] = put(sidx), scenes
+    h[15], h[16] = put(spool), scenes
+    datas = [_text(rnd, rnd.randrange(scene_size // 2, scene_size + 1)) for _ in range(scenes)]
+    di = bytearray()
+    o = 0
+    for d in datas:
+        di += struct.pack("<2i", o, len(d))
+        o += len(d)
+    h[17], h[18] = put(di), scenes
+    h[19], h[20] = put(b"".join(datas)), scenes
+    res = [
+        encrypt_resource(f"src/dir{i % 7}/file{i:05d}.ss", _text(rnd, rnd.randrange(entry_size // 2, entry_size + 1)), rnd)
+        for i in range(entries)
+    ]
+    if res:
+        dir_block = encrypt_resource("", struct.pack(f"<{len(res)}I", *map(len, res)), rnd)
+        h[22] = len(dir_block)
+        put(dir_block)
+        for r in res:
+            put(r)
+    body[0:92] = struct.pack("<23i", *h)
+    with open(path, "wb") as f:
+        f.write(body)
+    return len(body)
+
+def _best(fn, repeat: int):
+    best = None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        dt = time.perf_counter() - t0
+        best = dt if best is None or dt < best else best
+    return best
+
+def _row(stage: str, size: str, nbytes: int, seconds: float, **kw):
+    r = {"stage": stage, "size": size, "bytes": nbytes, "seconds": round(seconds, 6)}
+    r["mb_s"] = round(nbytes / seconds / 1e6, 3) if seconds > 0 else None
+    r.update(kw)
+    return r
+
+def bench_kernels(repeat: int):
+    rows = []
+    rnd = random.Random(7)
+    for mib in (8, 64):
+        buf = bytearray(os.urandom(mib * 1024 * 1024))
+        rows.append(_row("xor", f"{mib}MiB", len(buf), _best(lambda: ssd.xor_decrypt_inplace(buf, ssd.TABLE_DF70, 173, len(buf)), repeat)))
+    buf = None
+    ref = bytearray(os.urandom(1024 * 1024))
+    fast = _best(lambda: ssd.xor_decrypt_inplace(ref, ssd.TABLE_DF70, 173, len(ref)), repeat)
+    slow = _best(lambda: ssd.xor_decrypt_inplace_ref(ref, ssd.TABLE_DF70, 173, len(ref)), 1)
+    rows.append(_row("xor_ref", "1MiB", len(ref), slow, speedup=round(slow / fast, 1) if fast > 0 else None))
+    payload = _text(rnd, 1024 * 1024)
+    comp = lzss_compress(payload)
+    for name, fn in sorted(ssd.LZSS_BACKENDS.items()):
+        rows.append(_row("lzss", "1MiB", len(payload), _best(lambda: fn(comp, ssd.MAX_DECOMP), repeat), backend=name))
+    mask = os.urandom(23 * 19)
+    bw, bh = 57, 4096
+    n = 4 * bw * bh
+    src = os.urandom(n)
+    dst = bytearray(n)
+    fast = _best(lambda: ssd.blit_with_wrapping_mask(dst, src, bw, bh, mask, 23, 19, False), repeat)
+    slow = _best(lambda: ssd.blit_with_wrapping_mask_ref(dst, src, bw, bh, mask, 23, 19, False), 1)
+    rows.append(_row("blit", f"{n}B", n, fast))
+    rows.append(_row("blit_ref", f"{n}B", n, slow, speedup=round(slow / fast, 1) if fast > 0 else None))
+    block = encrypt_resource("bench/resource.ss", payload, rnd)
+    rows.append(_row("decrypt_resource", "1MiB", len(block), _best(lambda: ssd.decrypt_and_decompress_resource_safe(bytearray(block)), repeat)))
+    return rows
+
+def bench_pack(size: str, params, work: str, repeat: int, jobs: int):
+    rows = []
+    p1 = os.path.join(work, f"{size}_1.pck")
+    p2 = os.path.join(work, f"{size}_2.pck")
+    t0 = time.perf_counter()
+    n = make_pck(p1, seed=1, **params)
+    make_pck(p2, seed=2, **params)
+    rows.append(_row("generate", size, 2 * n, time.perf_counter() - t0))
+    sink = io.StringIO()
+    with ssd.PckFile(p1) as pf:
+        rows.append(_row("build_sections", size, n, _best(lambda: ssd.build_sections(pf.data), repeat)))
+        secs, _ = ssd.build_sections(pf.data)
+        rows.append(_row("digests", size, n, _best(lambda: [ssd.section_digest(pf.data, a, b) for a, b, *_ in secs], repeat)))
+
+    def export(decode):
+        out = tempfile.mkdtemp(dir=work)
+        try:
+            with contextlib.redirect_stdout(sink):
+                ssd.dump_all_sections(p1, out, jobs, decode, False)
+        finally:
+            shutil.rmtree(out, ignore_errors=True)
+
+    rows.append(_row("export_raw", size, n, _best(lambda: export(False), repeat), jobs=jobs))
+    rows.append(_row("export_decode", size, n, _best(lambda: export(True), repeat), jobs=jobs))
+
+    def compare():
+        with contextlib.redirect_stdout(sink):
+            ssd.compare_pcks(p1, p2, jobs=jobs, use_cache=False)
+
+    rows.append(_row("compare", size, 2 * n, _best(compare, repeat), jobs=jobs))
+    return rows
+
+def _verify_stream(src: bytes, cap: int, want, rnd: random.Random) -> int:
+    bad = 0
+    for chunk in (1, ssd.LZSS_WINDOW - 1, ssd.LZSS_WINDOW, rnd.randrange(2, 3 * ssd.LZSS_WINDOW)):
+        parts = []
+        try:
+            n = ssd.lzss_decompress_stream(src, parts.append, cap, chunk)
+            got = b"".join(parts)
+            if n != len(got):
+                got = None
+        except ValueError:
+            got = ValueError
+        if got != want:
+            bad += 1
+            print(f"lzss stream mismatch: chunk={chunk} cap={cap} src={src[:32].hex()}", file=sys.stderr)
+    return bad
+
+def verify(rounds: int, seed: int = None) -> int:
+    if seed is None:
+        seed = random.randrange(1 << 32)
+    print(f"verify: seed {seed} (rerun with --seed {seed})", file=sys.stderr)
+    rnd = random.Random(seed)
+    bad = 0
+
+    def lz_cases():
+        hdr = lambda n: struct.pack("<II", 0, n)
+        yield b""
+        yield hdr(10)[:7]
+        yield hdr(0xFFFFFFFF) + b"\xff" + b"a" * 8
+        yield hdr(10) + b"\x00" + struct.pack("<H", (5 << 4) | 3)
+        yield hdr(10) + b"\x01a" + struct.pack("<H", (2 << 4) | 3)
+        yield hdr(40) + b"\x01a" + struct.pack("<H", (1 << 4) | 15) + struct.pack("<H", (4095 << 4) | 15)
+        yield hdr(20) + b"\x01a" + struct.pack("<H", 15)
+        yield hdr(20) + b"\x03ab" + b"\x01"
+        for _ in range(rounds):
+            body = bytes(rnd.randrange(256) for _ in range(rnd.randrange(0, 300)))
+            yield struct.pack("<II", 0, rnd.choice([0, 1, 7, 300, rnd.randrange(1, 5000)])) + body
+            adv = bytearray()
+            for _ in range(rnd.randrange(1, 60)):
+                adv.append(rnd.choice([0x00, 0xFF, 0xAA, 0x0F, rnd.randrange(256)]))
+                for _ in range(rnd.randrange(0, 9)):
+                    w = rnd.choice([0, 1 << 4, (rnd.randrange(1, 8) << 4) | rnd.randrange(16), 0xFFFF, rnd.randrange(65536)])
+                    adv += struct.pack("<H", w)
+            yield struct.pack("<II", 0, rnd.randrange(0, 3000)) + bytes(adv)
+            c = lzss_compress(bytes(rnd.choice(b"abcab\x00") for _ in range(rnd.randrange(0, 3000))))
+            yield c
+            yield c[:rnd.randrange(0, len(c) + 1)]
+
+    if "c" not in ssd.LZSS_BACKENDS:
+        print("verify: compiled LZSS backend not built, only the Python decoders are compared", file=sys.stderr)
+    for src in lz_cases():
+        declared = min(struct.unpack_from("<I", src, 4)[0] if len(src) >= 8 else 0, 1 << 20)
+        for cap in (1 << 20, declared, max(0, declared - 1), rnd.randrange(0, 5000)):
+            try:
+                want = ssd.lzss_decompress_ref(src, cap)
+            except ValueError:
+                want = ValueError
+            for name, fn in ssd.LZSS_BACKENDS.items():
+                try:
+                    got = fn(src, cap)
+                except ValueError:
+                    got = ValueError
+                if got != want:
+                    bad += 1
+                    print(f"lzss mismatch: backend={name} cap={cap} src={src[:32].hex()}", file=sys.stderr)
+            bad += _verify_stream(src, cap, want, rnd)
+    for _ in range(rounds // 25 + 1):
+        far = rnd.randbytes(rnd.randrange(1, 64))
+        data = bytearray()
+        while len(data) < rnd.randrange(ssd.LZSS_WINDOW, 6 * ssd.LZSS_WINDOW):
+            data += far if rnd.random() < 0.3 else _text(rnd, rnd.randrange(1, ssd.LZSS_WINDOW - 64))
+        src = lzss_compress(bytes(data))
+        bad += _verify_stream(src, 1 << 20, bytes(data), rnd)
+    for _ in range(rounds // 10 + 1):
+        k = rnd.randrange(0, 70000)
+        st = rnd.randrange(256)
+        a = bytearray(rnd.randbytes(k))
+        b = bytearray(a)
+        ssd.xor_decrypt_inplace(a, ssd.TABLE_DE70, st, k)
+        ssd.xor_decrypt_inplace_ref(b, ssd.TABLE_DE70, st, k)
+        if a != b:
+            bad += 1
+            print(f"xor mismatch: len={k} start={st}", file=sys.stderr)
+        mw, mh, bw, bh = rnd.randrange(16, 32), rnd.randrange(16, 32), rnd.randrange(32, 64), rnd.randrange(1, 64)
+        mask = rnd.randbytes(mw * mh)
+        src = rnd.randbytes(4 * bw * bh)
+        for ult in (False, True):
+            a = bytearray(rnd.randbytes(4 * bw * bh))
+            b = bytearray(a)
+            ssd.blit_with_wrapping_mask(a, src, bw, bh, mask, mw, mh, ult)
+            ssd.blit_with_wrapping_mask_ref(b, src, bw, bh, mask, mw, mh, ult)
+            if a != b:
+                bad += 1
+                print(f"blit mismatch: {mw}x{mh} block {bw}x{bh}", file=sys.stderr)
+        payload = _text(rnd, rnd.randrange(0, 20000))
+        name = f"dir/f{rnd.randrange(1000)}.ss"
+        got = ssd.decrypt_and_decompress_resource_safe(bytearray(encrypt_resource(name, payload, rnd)))
+        if got != (name, payload):
+            bad += 1
+            print(f"resource roundtrip mismatch: {name} len={len(payload)}", file=sys.stderr)
+    print(f"verify: lzss backends {','.join(sorted(ssd.LZSS_BACKENDS))}: {'ok' if not bad else f'{bad} mismatches'}", file=sys.stderr)
+    return 1 if bad else 0
+
+def build_parser():
+    p = argparse.ArgumentParser(
+        prog="bench.py",
+        description="ssd.py benchmarks on synthetic packs (JSON results on stdout)",
+    )
+    p.add_argument("--sizes", default="small,medium", help=f"comma list of {','.join(SIZES)} (default: small,medium)")
+    p.add_argument("--repeat", type=int, default=3, help="runs per stage, best time kept (default: 3)")
+    p.add_argument("-j", "--jobs", type=int, default=1, metavar="N", help="ssd.py --jobs for export/compare")
+    p.add_argument("-o", "--output", help="write JSON here instead of stdout")
+    p.add_argument("--no-kernels", action="store_true", help="skip the xor/lzss/blit micro benchmarks")
+    p.add_argument("--verify", action="store_true", help="differentially fuzz fast paths against the reference ones and exit")
+    p.add_argument("--rounds", type=int, default=500, help="fuzz rounds for --verify (default: 500)")
+    p.add_argument("--seed", type=int, help="RNG seed for --verify (default: random, printed) and the synthetic packs (default: 1)")
+    p.add_argument("--gen", metavar="PCK", help="only write one synthetic pack (use --scenes/--entries/...)")
+    p.add_argument("--scenes", type=int, default=50)
+    p.add_argument("--entries", type=int, default=50)
+    p.add_argument("--scene-size", type=int, default=4096)
+    p.add_argument("--entry-size", type=int, default=16384)
+    return p
+
+def main():
+    args = build_parser().parse_args()
+    if args.verify:
+        return verify(args.rounds, args.seed)
+    if args.gen:
+        n = make_pck(args.gen, args.scenes, args.entries, args.scene_size, args.entry_size, args.seed or 1)
+        print(f"wrote {args.gen} ({n} bytes)")
+        return 0
+    sizes = [s for s in args.sizes.split(",") if s]
+    for s in sizes:
+        if s not in SIZES:
+            print(f"unknown size: {s}", file=sys.stderr)
+            return 2
+    rows = [] if args.no_kernels else bench_kernels(args.repeat)
+    work = tempfile.mkdtemp(prefix="ssd_bench_")
+    try:
+        for s in sizes:
+            rows += bench_pack(s, SIZES[s], work, args.repeat, args.jobs)
+    finally:
+        shutil.rmtree(work, ignore_errors=True)
+    doc = {
+        "time": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "lzss_default": ssd._lzss_name,
+        "numpy": ssd._np is not None,
+        "results": rows,
+    }
+    text = json.dumps(doc, indent=1)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+    return 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
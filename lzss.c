@@ -0,0 +1,44 @@
+/* Optional compiled LZSS backend for ssd.py (loaded via ctypes).
+ *   cc -O2 -shared -fPIC -o _ssd_lzss.so lzss.c
+ * Mirrors lzss_decompress_ref byte for byte; returns bytes written. */
+#include <stddef.h>
+#include <stdint.h>
+
+#ifdef _WIN32
+#define SSD_EXPORT __declspec(dllexport)
+#else
+#define SSD_EXPORT
+#endif
+
+SSD_EXPORT size_t ssd_lzss_decompress(const uint8_t *src, size_t n, uint8_t *out, size_t size)
+{
+    size_t sp = 8, dp = 0;
+    while (dp < size) {
+        if (sp >= n)
+            break;
+        unsigned flags = src[sp++];
+        for (int bit = 0; bit < 8; bit++) {
+            if (dp >= size)
+                break;
+            if (flags & 1) {
+                if (sp >= n)
+                    break;
+                out[dp++] = src[sp++];
+            } else {
+                if (sp + 2 > n)
+                    break;
+                unsigned word = src[sp] | ((unsigned)src[sp + 1] << 8);
+                sp += 2;
+                size_t len = (word & 0xF) + 2;
+                size_t off = word >> 4;
+                if (off == 0)
+                    break;
+                if (off <= dp)
+                    for (; len && dp < size; len--, dp++)
+                        out[dp] = out[dp - off];
+            }
+            flags >>= 1;
+        }
+    }
+    return dp;
+}
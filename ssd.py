@@ -1,8 +1,37 @@
 import argparse
+import asyncio
+import bisect
+import contextlib
+import csv
+import difflib
+import fnmatch
+import hashlib
+import itertools
+import json
+import mmap
 import os
 import re
+import shutil
 import struct
+import sys
+import tarfile
+import tempfile
+import threading
+import time
+import urllib.parse
+import warnings
+import zipfile
+import zlib
+from array import array
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from datetime import datetime
+from functools import lru_cache
+
+try:
+    import numpy as _np
+except ImportError:
+    _np = None
 
 TABLE_DC70 = bytes([
     0x28, 0x2D, 0x91, 0x73, 0xF5, 0x06, 0xD6, 0xBA, 0xBF, 0xF3, 0x45, 0x3F, 0xF1, 0x61, 0xB1, 0xE9,
@@ -86,19 +115,150 @@ cl = lambda v, a, b: a if v < a else b if v > b else v
 NAME_W = 50
 MAX_DECOMP = 512 * 1024 * 1024
 
+_PROF = None
+_PROF_HOOKS = []
+
+class Profiler:
+    def __init__(self, trace: bool = False):
+        self.t0 = time.perf_counter()
+        self.stats = {}
+        self.events = [] if trace else None
+        self._lock = threading.Lock()
+
+    def record(self, name: str, start: float, wall: float, cpu: float, nbytes: int = 0, calls: int = 1) -> None:
+        with self._lock:
+            st = self.stats.get(name)
+            if st is None:
+                st = self.stats[name] = [0, 0.0, 0.0, 0]
+            st[0] += calls
+            st[1] += wall
+            st[2] += cpu
+            st[3] += nbytes
+            if self.events is not None:
+                self.events.append({
+                    "name": name, "ph": "X", "pid": os.getpid(), "tid": threading.get_ident(),
+                    "ts": round((start - self.t0) * 1e6, 3), "dur": round(wall * 1e6, 3),
+                    "args": {"bytes": nbytes, "calls": calls, "cpu_us": round(cpu * 1e6, 3)},
+                })
+        for h in _PROF_HOOKS:
+            h(name, wall, cpu, nbytes, calls)
+
+    def summary(self):
+        return [
+            {"stage": k, "calls": c, "wall": w, "cpu": u, "bytes": nb, "mb_s": nb / w / 1e6 if nb and w > 0 else None}
+            for k, (c, w, u, nb) in self.stats.items()
+        ]
+
+    def print_summary(self, out=None) -> None:
+        out = out or sys.stderr
+        print("==== Profile ====", file=out)
+        print(f"{'STAGE':<14}  {'CALLS':>8}  {'WALL ms':>10}  {'CPU ms':>10}  {'BYTES':>12}  {'MB/s':>9}", file=out)
+        print(f"{'-'*14}  {'-'*8}  {'-'*10}  {'-'*10}  {'-'*12}  {'-'*9}", file=out)
+        for r in self.summary():
+            rate = f"{r['mb_s']:9.1f}" if r["mb_s"] is not None else f"{'-':>9}"
+            print(f"{r['stage']:<14}  {r['calls']:8d}  {r['wall'] * 1000:10.3f}  {r['cpu'] * 1000:10.3f}  {r['bytes']:12d}  {rate}", file=out)
+        print(f"total wall: {(time.perf_counter() - self.t0) * 1000:.3f} ms", file=out)
+
+    def write_trace(self, path: str) -> None:
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"traceEvents": self.events or [], "displayTimeUnit": "ms"}, f)
+
+class _Stage:
+    __slots__ = ("name", "nbytes", "calls", "t", "c")
+
+    def __init__(self, name: str, nbytes: int = 0, calls: int = 1):
+        self.name = name
+        self.nbytes = nbytes
+        self.calls = calls
+
+    def __enter__(self):
+        self.t = time.perf_counter()
+        self.c = time.thread_time()
+        return self
+
+    def __exit__(self, *exc):
+        p = _PROF
+        if p is not None:
+            p.record(self.name, self.t, time.perf_counter() - self.t, time.thread_time() - self.c, self.nbytes, self.calls)
+
+class _NoStage:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        pass
+
+_NO_STAGE = _NoStage()
+
+def stage(name: str, nbytes: int = 0, calls: int = 1):
+    if _PROF is None:
+        return _NO_STAGE
+    return _Stage(name, nbytes, calls)
+
+def enable_profiling(trace: bool = False) -> Profiler:
+    global _PROF
+    _PROF = Profiler(trace)
+    return _PROF
+
+def disable_profiling():
+    global _PROF
+    p, _PROF = _PROF, None
+    return p
+
+def add_profile_hook(fn) -> None:
+    _PROF_HOOKS.append(fn)
+
+def remove_profile_hook(fn) -> None:
+    if fn in _PROF_HOOKS:
+        _PROF_HOOKS.remove(fn)
+
 def _tables_ok():
     for t in (TABLE_DC70, TABLE_DD70, TABLE_DE70, TABLE_DF70):
         if not isinstance(t, (bytes, bytearray)) or len(t) != 256:
             return False
     return True
 
+KS_TILE = 32 * 1024
+
+_ks_cache = {}
+
+def _keystream(table: bytes, start_index: int):
+    k = (table, start_index % 256)
+    ks = _ks_cache.get(k)
+    if ks is None:
+        rot = table[k[1]:] + table[:k[1]]
+        tile = rot * (KS_TILE // 256)
+        ks = _ks_cache[k] = (tile, int.from_bytes(tile, "little"))
+    return ks
+
 def xor_decrypt_inplace(data: bytearray, table: bytes, start_index: int, length: int) -> None:
+    if length <= 0:
+        return
+    if length > len(data):
+        raise IndexError("bytearray index out of range")
+    tile, tile_int = _keystream(table, start_index)
+    if _np is not None and length >= 4096:
+        a = _np.frombuffer(data, dtype=_np.uint8, count=length)
+        reps = length // KS_TILE + 1
+        a ^= _np.tile(_np.frombuffer(tile, dtype=_np.uint8), reps)[:length]
+        return
+    mv = memoryview(data)
+    fb = int.from_bytes
+    full = length - length % KS_TILE
+    for o in range(0, full, KS_TILE):
+        mv[o:o + KS_TILE] = (fb(mv[o:o + KS_TILE], "little") ^ tile_int).to_bytes(KS_TILE, "little")
+    rest = length - full
+    if rest:
+        x = fb(mv[full:length], "little") ^ fb(tile[:rest], "little")
+        mv[full:length] = x.to_bytes(rest, "little")
+
+def xor_decrypt_inplace_ref(data: bytearray, table: bytes, start_index: int, length: int) -> None:
     idx = start_index
     for i in range(length):
         data[i] ^= table[idx]
         idx = (idx + 1) % 256
 
-def lzss_decompress_limited(src: bytes, max_out: int) -> bytes:
+def lzss_decompress_ref(src: bytes, max_out: int) -> bytes:
     if not src or len(src) < 8:
         return b""
     decompressed_size = struct.unpack_from("<I", src, 4)[0]
@@ -142,7 +302,211 @@ def lzss_decompress_limited(src: bytes, max_out: int) -> bytes:
             flags >>= 1
     return bytes(output)
 
-def blit_with_wrapping_mask(dst: bytearray, src: bytes, block_width: int, block_height: int, mask: bytes, mask_width: int, mask_height: int, use_less_than: bool) -> None:
+def _lz_runs(flags: int):
+    runs = []
+    for _ in range(8):
+        lit = flags & 1
+        if runs and runs[-1][0] == lit:
+            runs[-1][1] += 1
+        else:
+            runs.append([lit, 1])
+        flags >>= 1
+    return tuple((bool(a), b) for a, b in runs)
+
+_LZ_RUNS = tuple(_lz_runs(f) for f in range(256))
+
+def lzss_decompress_fast(src: bytes, max_out: int) -> bytes:
+    if not src or len(src) < 8:
+        return b""
+    decompressed_size = struct.unpack_from("<I", src, 4)[0]
+    if decompressed_size == 0:
+        return b""
+    if decompressed_size > max_out:
+        raise ValueError("decompressed_size too large")
+    if not isinstance(src, bytes):
+        src = bytes(src)
+    n = len(src)
+    out = bytearray()
+    pos = 8
+    done = False
+    while not done and len(out) < decompressed_size and pos < n:
+        flags = src[pos]
+        pos += 1
+        for lit, cnt in _LZ_RUNS[flags]:
+            if lit:
+                k = min(cnt, decompressed_size - len(out))
+                chunk = src[pos:pos + k]
+                out += chunk
+                pos += len(chunk)
+                if len(chunk) < k or len(out) >= decompressed_size:
+                    done = True
+                    break
+                continue
+            for _ in range(cnt):
+                d = len(out)
+                if d >= decompressed_size or pos + 2 > n:
+                    done = True
+                    break
+                word = src[pos] | (src[pos + 1] << 8)
+                pos += 2
+                offset = word >> 4
+                if offset <= 0:
+                    break
+                if offset > d:
+                    continue
+                length = min((word & 0xF) + 2, decompressed_size - d)
+                start = d - offset
+                if offset >= length:
+                    out += out[start:start + length]
+                else:
+                    out += (out[start:] * (length // offset + 1))[:length]
+            else:
+                continue
+            break
+    if len(out) < decompressed_size:
+        out += bytes(decompressed_size - len(out))
+    return bytes(out)
+
+LZSS_WINDOW = 4096
+LZSS_CHUNK = 1024 * 1024
+LZSS_STREAM_MIN = 64 * 1024 * 1024
+
+def lzss_size(src) -> int:
+    return struct.unpack_from("<I", src, 4)[0] if src and len(src) >= 8 else 0
+
+def lzss_decompress_stream(src, sink, max_out: int = None, chunk: int = LZSS_CHUNK) -> int:
+    if not src or len(src) < 8:
+        return 0
+    decompressed_size = struct.unpack_from("<I", src, 4)[0]
+    if decompressed_size == 0:
+        return 0
+    if max_out is not None and decompressed_size > max_out:
+        raise ValueError("decompressed_size too large")
+    n = len(src)
+    out = bytearray()
+    base = 0
+    pos = 8
+    done = False
+    while not done and base + len(out) < decompressed_size and pos < n:
+        if len(out) >= chunk + LZSS_WINDOW:
+            k = len(out) - LZSS_WINDOW
+            sink(out[:k])
+            del out[:k]
+            base += k
+        flags = src[pos]
+        pos += 1
+        for lit, cnt in _LZ_RUNS[flags]:
+            if lit:
+                k = min(cnt, decompressed_size - base - len(out))
+                piece = src[pos:pos + k]
+                out += piece
+                pos += len(piece)
+                if len(piece) < k or base + len(out) >= decompressed_size:
+                    done = True
+                    break
+                continue
+            for _ in range(cnt):
+                d = base + len(out)
+                if d >= decompressed_size or pos + 2 > n:
+                    done = True
+                    break
+                word = src[pos] | (src[pos + 1] << 8)
+                pos += 2
+                offset = word >> 4
+                if offset <= 0:
+                    break
+                if offset > d:
+                    continue
+                length = min((word & 0xF) + 2, decompressed_size - d)
+                start = len(out) - offset
+                if offset >= length:
+                    out += out[start:start + length]
+                else:
+                    out += (out[start:] * (length // offset + 1))[:length]
+            else:
+                continue
+            break
+    pad = decompressed_size - base - len(out)
+    if out:
+        sink(out)
+    while pad > 0:
+        k = min(pad, chunk)
+        sink(bytes(k))
+        pad -= k
+    return decompressed_size
+
+def _load_lzss_lib():
+    import ctypes
+    here = os.path.dirname(os.path.abspath(__file__))
+    cands = [os.environ.get("SSD_LZSS_LIB", "")]
+    cands += [os.path.join(here, "_ssd_lzss" + ext) for ext in (".so", ".dylib", ".dll")]
+    for p in cands:
+        if not p or not os.path.isfile(p):
+            continue
+        try:
+            lib = ctypes.CDLL(p)
+        except OSError:
+            continue
+        fn = lib.ssd_lzss_decompress
+        fn.argtypes = (ctypes.c_char_p, ctypes.c_size_t, ctypes.c_void_p, ctypes.c_size_t)
+        fn.restype = ctypes.c_size_t
+        return ctypes, fn
+    return None
+
+def _make_lzss_c(ct):
+    ctypes, fn = ct
+
+    def lzss_decompress_c(src: bytes, max_out: int) -> bytes:
+        if not src or len(src) < 8:
+            return b""
+        decompressed_size = struct.unpack_from("<I", src, 4)[0]
+        if decompressed_size == 0:
+            return b""
+        if decompressed_size > max_out:
+            raise ValueError("decompressed_size too large")
+        if not isinstance(src, bytes):
+            src = bytes(src)
+        output = bytearray(decompressed_size)
+        fn(src, len(src), ctypes.addressof((ctypes.c_char * decompressed_size).from_buffer(output)), decompressed_size)
+        return bytes(output)
+
+    return lzss_decompress_c
+
+LZSS_BACKENDS = {"ref": lzss_decompress_ref, "fast": lzss_decompress_fast}
+
+def register_lzss_backend(name: str, fn) -> None:
+    LZSS_BACKENDS[name] = fn
+
+try:
+    _ct = _load_lzss_lib()
+except Exception:
+    _ct = None
+if _ct is not None:
+    register_lzss_backend("c", _make_lzss_c(_ct))
+
+_lzss_name = "c" if "c" in LZSS_BACKENDS else "fast"
+_lzss = LZSS_BACKENDS[_lzss_name]
+
+def set_lzss_backend(name: str) -> None:
+    global _lzss, _lzss_name
+    if name not in LZSS_BACKENDS:
+        raise ValueError(f"unknown lzss backend: {name} (have: {', '.join(sorted(LZSS_BACKENDS))})")
+    _lzss = LZSS_BACKENDS[name]
+    _lzss_name = name
+
+if os.environ.get("SSD_LZSS") in LZSS_BACKENDS:
+    set_lzss_backend(os.environ["SSD_LZSS"])
+
+def lzss_decompress_limited(src: bytes, max_out: int) -> bytes:
+    return _lzss(src, max_out)
+
+_max_decomp = MAX_DECOMP
+
+def set_max_decomp(n: int = None) -> None:
+    global _max_decomp
+    _max_decomp = MAX_DECOMP if n is None else n
+
+def blit_with_wrapping_mask_ref(dst: bytearray, src: bytes, block_width: int, block_height: int, mask: bytes, mask_width: int, mask_height: int, use_less_than: bool) -> None:
     if not src or not dst:
         return
     mask_total = mask_width * mask_height
@@ -171,13 +535,61 @@ def blit_with_wrapping_mask(dst: bytearray, src: bytes, block_width: int, block_
         if row_offset >= mask_total:
             row_offset = 0
 
-def decrypt_and_decompress_resource_safe(block: bytearray):
+_MASK_HI = bytes(0xFF if i >= 0x80 else 0 for i in range(256))
+
+@lru_cache(maxsize=64)
+def _mask_period(mask: bytes, mask_width: int, mask_height: int, block_width: int, rows: int) -> bytes:
+    start_row = (mask_height - 37 % mask_height) % mask_height
+    start_col = (mask_width - 111 % mask_width) % mask_width
+    reps = block_width // mask_width + 2
+    sel = b"".join(
+        (mask[((start_row + r) % mask_height) * mask_width:][:mask_width] * reps)[start_col:start_col + block_width]
+        for r in range(rows)
+    ).translate(_MASK_HI)
+    out = bytearray(4 * len(sel))
+    for k in range(4):
+        out[k::4] = sel
+    return bytes(out)
+
+def _mask_plan(mask: bytes, mask_width: int, mask_height: int, block_width: int, block_height: int):
+    period = _mask_period(bytes(mask), mask_width, mask_height, block_width, min(block_height, mask_height))
+    q, r = divmod(block_height, mask_height)
+    sel = period * q + period[: r * 4 * block_width]
+    hi = int.from_bytes(sel, "little")
+    return hi, hi ^ ((1 << (8 * len(sel))) - 1)
+
+def blit_with_wrapping_mask(dst: bytearray, src: bytes, block_width: int, block_height: int, mask: bytes, mask_width: int, mask_height: int, use_less_than: bool) -> None:
+    if not src or not dst:
+        return
+    n = 4 * block_width * block_height
+    hi, lo = _mask_plan(bytes(mask), mask_width, mask_height, block_width, block_height)
+    m = lo if use_less_than else hi
+    d = int.from_bytes(memoryview(dst)[:n], "little")
+    s = int.from_bytes(memoryview(src)[:n], "little")
+    dst[:n] = ((d & (m ^ (hi | lo))) | (s & m)).to_bytes(n, "little")
+
+def _unmask_pair(src1, src2, block_width: int, block_height: int, mask: bytes, mask_width: int, mask_height: int):
+    n = 4 * block_width * block_height
+    hi, lo = _mask_plan(bytes(mask), mask_width, mask_height, block_width, block_height)
+    a = int.from_bytes(src1, "little")
+    b = int.from_bytes(src2, "little")
+    return ((a & hi) | (b & lo)).to_bytes(n, "little"), ((a & lo) | (b & hi)).to_bytes(n, "little")
+
+def _resource_mask(header, mask_width: int, mask_height: int) -> bytes:
+    key = bytes(header[(11 + i) % 16 + 1] & 0xFF for i in range(16)) * 16
+    de = TABLE_DE70[96:] + TABLE_DE70[:96]
+    period = (int.from_bytes(de, "little") ^ int.from_bytes(key, "little")).to_bytes(256, "little")
+    mask_size = mask_width * mask_height
+    return (period * (mask_size // 256 + 1))[:mask_size]
+
+def decrypt_resource(block: bytearray):
     if not _tables_ok():
         raise RuntimeError("tables missing")
     bs = len(block)
     if bs < 76:
         raise ValueError("too small")
-    xor_decrypt_inplace(block, TABLE_DD70, 13, bs)
+    with stage("xor", bs):
+        xor_decrypt_inplace(block, TABLE_DD70, 13, bs)
     header = struct.unpack_from("<19I", block, 0)
     param6 = header[6]
     param9 = header[9]
@@ -206,50 +618,62 @@ def decrypt_and_decompress_resource_safe(block: bytearray):
     filename_data = bytearray(block[filename_start : filename_start + filename_len])
     xor_decrypt_inplace(filename_data, TABLE_DC70, 59, filename_len)
     filename = filename_data.decode("utf-16-le", errors="replace").rstrip("\x00")
-    mask_size = mask_width * mask_height
-    mask = bytearray(mask_size)
-    idx_96 = 96
-    idx_11 = 11
-    for i in range(mask_size):
-        header_idx = (idx_11 + 1)
-        val = (header[header_idx] & 0xFF) if header_idx < 19 else 0
-        mask[i] = TABLE_DE70[idx_96] ^ val
-        idx_96 = (idx_96 + 1) % 256
-        idx_11 = (idx_11 + 1) % 16
-    buf1 = bytearray(total_size)
-    buf2 = bytearray(total_size)
-    src1 = bytes(block[data_start : data_start + total_size])
-    src2 = bytes(block[data_start + total_size : data_start + 2 * total_size])
-    blit_with_wrapping_mask(buf1, src1, block_width, block_height, mask, mask_width, mask_height, False)
-    blit_with_wrapping_mask(buf1, src2, block_width, block_height, mask, mask_width, mask_height, True)
-    blit_with_wrapping_mask(buf2, src1, block_width, block_height, mask, mask_width, mask_height, True)
-    blit_with_wrapping_mask(buf2, src2, block_width, block_height, mask, mask_width, mask_height, False)
-    combined = bytearray(compressed_size)
-    combined[:half_size] = buf1[:half_size]
-    combined[half_size:compressed_size] = buf2[: compressed_size - half_size]
-    xor_decrypt_inplace(combined, TABLE_DF70, 173, compressed_size)
-    result = lzss_decompress_limited(bytes(combined), MAX_DECOMP)
-    return filename, result
-
-def mr(ranges):
-    r = [(a, b) for a, b in ranges if b > a]
-    if not r:
-        return []
-    r.sort()
-    o = [r[0]]
-    for a, b in r[1:]:
-        pa, pb = o[-1]
-        if a <= pb:
-            o[-1] = (pa, max(pb, b))
-        else:
-            o.append((a, b))
-    return o
-
-def uu(n, ranges):
-    m = mr((cl(a, 0, n), cl(b, 0, n)) for a, b in ranges)
-    u = sum(b - a for a, b in m)
-    un = n - u
-    return u, un, (un / n * 100.0 if n else 0.0)
+    with stage("unmask", 2 * total_size):
+        mask = _resource_mask(header, mask_width, mask_height)
+        mv = memoryview(block)
+        buf1, buf2 = _unmask_pair(
+            mv[data_start : data_start + total_size],
+            mv[data_start + total_size : data_start + 2 * total_size],
+            block_width, block_height, mask, mask_width, mask_height,
+        )
+        combined = bytearray(compressed_size)
+        combined[:half_size] = buf1[:half_size]
+        combined[half_size:compressed_size] = buf2[: compressed_size - half_size]
+    with stage("xor", compressed_size):
+        xor_decrypt_inplace(combined, TABLE_DF70, 173, compressed_size)
+    return filename, combined
+
+def decompress_resource(combined, max_out: int = None) -> bytes:
+    with stage("lzss", lzss_size(combined)):
+        return lzss_decompress_limited(bytes(combined), _max_decomp if max_out is None else max_out)
+
+def decompress_resource_to(combined, sink, max_out: int = None, chunk: int = LZSS_CHUNK) -> int:
+    max_out = _max_decomp if max_out is None else max_out
+    if lzss_size(combined) <= min(max_out, LZSS_STREAM_MIN):
+        out = decompress_resource(combined, max_out)
+        if out:
+            sink(out)
+        return len(out)
+    with stage("lzss_stream", lzss_size(combined)):
+        return lzss_decompress_stream(combined, sink, max_out, chunk)
+
+def decrypt_and_decompress_resource_safe(block: bytearray, max_out: int = None):
+    filename, combined = decrypt_resource(block)
+    return filename, decompress_resource(combined, max_out)
+
+def decode_resource_to(block: bytearray, sink, max_out: int = None) -> tuple:
+    filename, combined = decrypt_resource(block)
+    return filename, decompress_resource_to(combined, sink, max_out)
+
+def merge_sorted_ranges(starts, ends):
+    ma = array("q")
+    mb = array("q")
+    pa = pb = None
+    for a, b in zip(starts, ends):
+        if b <= a:
+            continue
+        if pb is not None and a <= pb:
+            if b > pb:
+                pb = b
+            continue
+        if pb is not None:
+            ma.append(pa)
+            mb.append(pb)
+        pa, pb = a, b
+    if pb is not None:
+        ma.append(pa)
+        mb.append(pb)
+    return ma, mb
 
 def read_index_list(data: bytes, ofs: int, cnt: int, total_size: int):
     if cnt <= 0:
@@ -294,7 +718,7 @@ def build_string_table(data: bytes, idx_ofs: int, idx_cnt: int, pool_ofs: int, p
     pool_end = cl(pool_end, 0, total_size)
     if pool_end < pool_ofs:
         pool_end = pool_ofs
-    pool = data[pool_ofs:pool_end]
+    pool = bytes(data[pool_ofs:pool_end])
     total_chars = 0
     for o, s in idx:
         if o < 0 or s < 0:
@@ -335,22 +759,32 @@ def td(data: bytes, off: int, sz: int):
         return None
     return vd(dd, len(data), off + sz)
 
-def nf(data: bytes, off: int, sz: int):
+@lru_cache(maxsize=1)
+def _name_keys():
     if not _tables_ok():
         return None
+    fnl_key = struct.unpack("<I", bytes(TABLE_DD70[(13 + 72 + i) % 256] for i in range(4)))[0]
+    table = bytes(TABLE_DD70[(13 + 76 + i) % 256] ^ TABLE_DC70[(59 + i) % 256] for i in range(256))
+    return fnl_key, table, table * (KS_TILE // 256)
+
+def nf(data: bytes, off: int, sz: int):
+    keys = _name_keys()
+    if keys is None:
+        return None
     if sz < 76:
         return None
+    fnl_key, table, tile = keys
     try:
-        b = bytearray(data[off:off + 76])
-        xor_decrypt_inplace(b, TABLE_DD70, 13, len(b))
-        fnl = struct.unpack_from("<19I", b, 0)[18]
+        fnl = struct.unpack_from("<I", data, off + 72)[0] ^ fnl_key
         need = 76 + fnl
         if fnl <= 0 or need > sz:
             return None
-        b2 = bytearray(data[off:off + need])
-        xor_decrypt_inplace(b2, TABLE_DD70, 13, len(b2))
-        fn = bytearray(b2[76:need])
-        xor_decrypt_inplace(fn, TABLE_DC70, 59, len(fn))
+        if fnl > KS_TILE:
+            fn = bytearray(data[off + 76:off + need])
+            xor_decrypt_inplace(fn, table, 0, fnl)
+        else:
+            x = int.from_bytes(data[off + 76:off + need], "little") ^ int.from_bytes(tile[:fnl], "little")
+            fn = x.to_bytes(fnl, "little")
         return fn.decode("utf-16-le", errors="replace").rstrip("\x00")
     except Exception:
         return None
@@ -392,9 +826,367 @@ def _dn(name: str) -> str:
         return "…"
     return name[: NAME_W - 1] + "…"
 
-def build_sections(data: bytes):
+class PckFile:
+    def __init__(self, path: str):
+        self.path = path
+        self._f = open(path, "rb")
+        self._mm = None
+        try:
+            self._mm = mmap.mmap(self._f.fileno(), 0, access=mmap.ACCESS_READ)
+            self.data = memoryview(self._mm)
+        except (ValueError, OSError):
+            self.data = memoryview(self._f.read())
+
+    def __len__(self):
+        return len(self.data)
+
+    def fileno(self) -> int:
+        return self._f.fileno()
+
+    def close(self):
+        if self._f is None:
+            return
+        try:
+            self.data.release()
+            if self._mm is not None:
+                self._mm.close()
+        except BufferError:
+            pass
+        self._f.close()
+        self._f = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+IO_THREADS = 4
+IO_MEM_LIMIT = 256 * 1024 * 1024
+
+def _copy_range(src_fd: int, dst_fd: int, data, off: int, count: int) -> None:
+    for fn in (getattr(os, "copy_file_range", None), getattr(os, "sendfile", None)):
+        if fn is None or src_fd is None:
+            continue
+        try:
+            while count > 0:
+                if fn is os.sendfile:
+                    k = fn(dst_fd, src_fd, off, count)
+                else:
+                    k = fn(src_fd, dst_fd, count, off)
+                if k <= 0:
+                    break
+                off += k
+                count -= k
+        except OSError:
+            pass
+        if count <= 0:
+            return
+    while count > 0:
+        k = os.write(dst_fd, data[off:off + min(count, 8 * 1024 * 1024)])
+        off += k
+        count -= k
+
+class SectionWriter:
+    def __init__(self, threads: int = IO_THREADS, mem_limit: int = IO_MEM_LIMIT, src=None):
+        self._ex = ThreadPoolExecutor(max_workers=max(1, threads))
+        self._cv = threading.Condition()
+        self._pending = 0
+        self._bytes = 0
+        self._max_pending = max(1, threads) * 64
+        self._mem_limit = max(1, mem_limit)
+        self._dirs = set()
+        self._src = src
+        self.errors = []
+
+    def _mkdir(self, d: str) -> None:
+        if d in self._dirs:
+            return
+        os.makedirs(d, exist_ok=True)
+        self._dirs.add(d)
+
+    def _acquire(self, nbytes: int) -> None:
+        with self._cv:
+            while self._pending >= self._max_pending or (self._bytes and self._bytes + nbytes > self._mem_limit):
+                self._cv.wait()
+            self._pending += 1
+            self._bytes += nbytes
+
+    def _release(self, nbytes: int) -> None:
+        with self._cv:
+            self._pending -= 1
+            self._bytes -= nbytes
+            self._cv.notify_all()
+
+    def _run(self, path: str, nbytes: int, job, size: int = None) -> bool:
+        try:
+            with stage("write", nbytes if size is None else size):
+                self._mkdir(os.path.dirname(path))
+                fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC | getattr(os, "O_BINARY", 0), 0o666)
+                try:
+                    job(fd)
+                finally:
+                    os.close(fd)
+            return True
+        except Exception as e:
+            self.errors.append((path, f"{type(e).__name__}: {e}"))
+            return False
+        finally:
+            self._release(nbytes)
+
+    def write_range(self, path: str, a: int, b: int):
+        src = self._src
+        self._acquire(0)
+        return self._ex.submit(self._run, path, 0, lambda fd: _copy_range(src.fileno(), fd, src.data, a, b - a), b - a)
+
+    def write_bytes(self, path: str, buf):
+        self._acquire(len(buf))
+
+        def job(fd):
+            mv = memoryview(buf)
+            while mv:
+                mv = mv[os.write(fd, mv):]
+
+        return self._ex.submit(self._run, path, len(buf), job)
+
+    def close(self) -> None:
+        self._ex.shutdown(wait=True)
+
+POOL_MIN_ENTRIES = 64
+
+_w_files = {}
+
+def _pool_init(lzss_name: str, max_decomp: int = MAX_DECOMP) -> None:
+    set_lzss_backend(lzss_name)
+    set_max_decomp(max_decomp)
+
+def _w_data(path: str):
+    pf = _w_files.get(path)
+    if pf is None:
+        pf = _w_files[path] = PckFile(path)
+    return pf.data
+
+def _w_names(path: str, ranges):
+    data = _w_data(path)
+    return [nf(data, a, b - a) for a, b in ranges]
+
+def _decode_entry(data, a: int, b: int, base_out: str, name: str, writer=None):
+    t0 = time.perf_counter()
+    try:
+        fn, combined = decrypt_resource(bytearray(data[a:b]))
+        fn = fn or name
+        out_path = _safe_join(base_out, name)
+        size = lzss_size(combined)
+        if size > _max_decomp:
+            raise ValueError("decompressed_size too large")
+        if size > LZSS_STREAM_MIN:
+            os.makedirs(os.path.dirname(out_path), exist_ok=True)
+            part = out_path + ".part"
+            try:
+                with open(part, "wb") as f:
+                    n = decompress_resource_to(combined, f.write)
+            except BaseException:
+                with contextlib.suppress(OSError):
+                    os.remove(part)
+                raise
+            os.replace(part, out_path)
+            return fn, n, time.perf_counter() - t0, None, None
+        payload = decompress_resource(combined)
+        if writer is not None:
+            return fn, len(payload), time.perf_counter() - t0, None, writer.write_bytes(out_path, payload)
+        os.makedirs(os.path.dirname(out_path), exist_ok=True)
+        with open(out_path, "wb") as f:
+            f.write(payload)
+        return fn, len(payload), time.perf_counter() - t0, None, None
+    except Exception as e:
+        return name, 0, time.perf_counter() - t0, f"{type(e).__name__}: {e}", None
+
+def _w_decode(path: str, items):
+    data = _w_data(path)
+    return [_decode_entry(data, *it) for it in items]
+
+def decode_entries(data, items, pool=None, path: str = None, writer=None):
+    if pool is None or path is None:
+        return (_decode_entry(data, *it, writer) for it in items)
+    return pool_map(pool, _w_decode, path, items, lambda c: [_decode_entry(data, *it) for it in c], 1)
+
+def make_pool(jobs: int):
+    if jobs <= 1:
+        return None
+    return ProcessPoolExecutor(max_workers=jobs, initializer=_pool_init, initargs=(_lzss_name, _max_decomp))
+
+def _chunks(items, jobs: int, min_chunk: int = 16):
+    k = max(min_chunk, -(-len(items) // (jobs * 4)))
+    return [items[i:i + k] for i in range(0, len(items), k)]
+
+def pool_map(pool, fn, path: str, items, local, min_chunk: int = 16, window: int = None):
+    chunks = iter(_chunks(items, pool._max_workers, min_chunk))
+    futs = deque((c, pool.submit(fn, path, c)) for c in itertools.islice(chunks, window))
+    while futs:
+        c, fut = futs.popleft()
+        for nxt in itertools.islice(chunks, 1):
+            futs.append((nxt, pool.submit(fn, path, nxt)))
+        try:
+            res = fut.result()
+        except Exception:
+            res = local(c)
+        yield from res
+
+def _entry_names(data, ranges, pool, path: str):
+    if pool is None or path is None or len(ranges) < POOL_MIN_ENTRIES:
+        return (nf(data, a, b - a) for a, b in ranges)
+    return pool_map(pool, _w_names, path, ranges, lambda c: [nf(data, a, b - a) for a, b in c])
+
+class SectionTable:
+    __slots__ = ("start", "end", "sym", "pr", "nid", "ex", "names", "_ids")
+
+    def __init__(self, names=None):
+        self.start = array("q")
+        self.end = array("q")
+        self.sym = bytearray()
+        self.pr = bytearray()
+        self.nid = array("I")
+        self.ex = bytearray()
+        self.names = [] if names is None else names
+        self._ids = None
+
+    def intern(self, name: str) -> int:
+        ids = self._ids
+        if ids is None:
+            ids = self._ids = {x: i for i, x in enumerate(self.names)}
+        i = ids.get(name)
+        if i is None:
+            i = ids[name] = len(self.names)
+            self.names.append(name)
+        return i
+
+    def append(self, a: int, b: int, sym: str, pr: int, name: str, ex: bool = False) -> None:
+        self.start.append(a)
+        self.end.append(b)
+        self.sym.append(ord(sym))
+        self.pr.append(pr)
+        self.nid.append(self.intern(name))
+        self.ex.append(bool(ex))
+
+    def __len__(self):
+        return len(self.start)
+
+    def __iter__(self):
+        names = self.names
+        return zip(self.start, self.end, self.sym.decode("latin-1"), self.pr, (names[i] for i in self.nid), map(bool, self.ex))
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return self.take(range(*i.indices(len(self))))
+        return self.start[i], self.end[i], chr(self.sym[i]), self.pr[i], self.names[self.nid[i]], bool(self.ex[i])
+
+    def name(self, i: int) -> str:
+        return self.names[self.nid[i]]
+
+    def take(self, idx) -> "SectionTable":
+        t = SectionTable(self.names)
+        t._ids = self._ids
+        st, en, sy, pr, nid, ex = self.start, self.end, self.sym, self.pr, self.nid, self.ex
+        idx = idx if isinstance(idx, (list, range)) else list(idx)
+        t.start = array("q", [st[i] for i in idx])
+        t.end = array("q", [en[i] for i in idx])
+        t.sym = bytearray([sy[i] for i in idx])
+        t.pr = bytearray([pr[i] for i in idx])
+        t.nid = array("I", [nid[i] for i in idx])
+        t.ex = bytearray([ex[i] for i in idx])
+        return t
+
+    def order(self):
+        st, en, sy, pr, nid, names = self.start, self.end, self.sym, self.pr, self.nid, self.names
+        return sorted(range(len(st)), key=lambda i: (st[i], en[i], -pr[i], sy[i], names[nid[i]]))
+
+    def sorted(self) -> "SectionTable":
+        return self.take(self.order())
+
+    def columns(self):
+        return {
+            "start": self.start.tolist(),
+            "end": self.end.tolist(),
+            "sym": self.sym.decode("latin-1"),
+            "pr": list(self.pr),
+            "nid": self.nid.tolist(),
+            "names": self.names,
+        }
+
+    @classmethod
+    def from_columns(cls, c) -> "SectionTable":
+        t = cls(list(c["names"]))
+        t.start = array("q", c["start"])
+        t.end = array("q", c["end"])
+        t.sym = bytearray(c["sym"], "latin-1")
+        t.pr = bytearray(c["pr"])
+        t.nid = array("I", c["nid"])
+        t.ex = bytearray(len(t.start))
+        return t
+
+class IntervalIndex:
+    def __init__(self, secs: SectionTable):
+        self.secs = secs
+        st, en, pr = secs.start, secs.end, secs.pr
+        bounds = sorted(set(st) | set(en))
+        pos = {x: k for k, x in enumerate(bounds)}
+        cover = [[] for _ in range(max(0, len(bounds) - 1))]
+        for i, (a, b) in enumerate(zip(st, en)):
+            for k in range(pos[a], pos[b]):
+                cover[k].append(i)
+        self.bounds = array("q", bounds)
+        self.off = array("q", [0])
+        self.ids = array("I")
+        for c in cover:
+            if len(c) > 1:
+                c.sort(key=lambda i: (en[i] - st[i], -pr[i], st[i]))
+            self.ids.extend(c)
+            self.off.append(len(self.ids))
+
+    def __len__(self):
+        return len(self.off) - 1
+
+    def segment(self, offset: int) -> int:
+        k = bisect.bisect_right(self.bounds, offset) - 1
+        return k if 0 <= k < len(self.off) - 1 else -1
+
+    def _ids(self, k: int):
+        return self.ids[self.off[k]:self.off[k + 1]].tolist() if k >= 0 else []
+
+    def at(self, offset: int):
+        return self._ids(self.segment(offset))
+
+    def owner(self, offset: int) -> int:
+        k = self.segment(offset)
+        return self.ids[self.off[k]] if k >= 0 and self.off[k + 1] > self.off[k] else -1
+
+    def overlapping(self, a: int, b: int):
+        if b <= a:
+            return []
+        k0 = max(0, bisect.bisect_right(self.bounds, a) - 1)
+        k1 = min(len(self.off) - 1, bisect.bisect_left(self.bounds, b))
+        got = set(self.ids[self.off[k0]:self.off[k1]]) if k1 > k0 else set()
+        st = self.secs.start
+        return sorted(got, key=lambda i: (st[i], i))
+
+    def at_many(self, offsets):
+        br = bisect.bisect_right
+        bounds, off, ids = self.bounds, self.off, self.ids
+        nseg = len(off) - 1
+        seen = {}
+        out = []
+        for x in offsets:
+            k = br(bounds, x) - 1
+            r = seen.get(k)
+            if r is None:
+                r = seen[k] = tuple(ids[off[k]:off[k + 1]]) if 0 <= k < nseg else ()
+            out.append(r)
+        return out
+
+def build_sections(data: bytes, pool=None, path: str = None, want_names: bool = True, on_section=None):
     n = len(data)
-    h = struct.unpack_from("<23i", data, 0)
+    with stage("header", 92):
+        h = struct.unpack_from("<23i", data, 0)
     header_size = h[0]
     if header_size < 92 or header_size > n:
         header_size = 92
@@ -412,20 +1204,15 @@ def build_sections(data: bytes):
     scn_data_exe_angou_mod = h[21]
     original_source_header_size = h[22]
 
-    secs = []
-    used = []
+    secs = SectionTable()
 
     def add(a, b, name, sym, pr):
         a2 = cl(a, 0, n)
         b2 = cl(b, 0, n)
         if b2 > a2:
-            secs.append([a2, b2, sym, pr, name, False])
-
-    def use(a, b):
-        a2 = cl(a, 0, n)
-        b2 = cl(b, 0, n)
-        if b2 > a2:
-            used.append((a2, b2))
+            secs.append(a2, b2, sym, pr, name)
+            if on_section is not None:
+                on_section((a2, b2, sym, pr, name, False))
 
     def add_fixed(ofs, cnt, elem_sz, name, sym):
         if cnt <= 0:
@@ -433,10 +1220,8 @@ def build_sections(data: bytes):
         a = ofs
         b = ofs + cnt * elem_sz
         add(a, b, name, sym, 80)
-        use(a, b)
 
     add(0, header_size, "pack_header", "H", 100)
-    use(0, header_size)
 
     add_fixed(inc_prop_list_ofs, inc_prop_cnt, 8, "inc_prop_list", "P")
     add_fixed(inc_prop_name_index_list_ofs, inc_prop_name_index_cnt, 8, "inc_prop_name_index_list", "p")
@@ -444,7 +1229,6 @@ def build_sections(data: bytes):
     inc_prop_name_list_end = inc_cmd_list_ofs if inc_cmd_list_ofs > inc_prop_name_list_ofs else n
     if inc_prop_name_list_ofs >= 0 and inc_prop_name_list_end > inc_prop_name_list_ofs:
         add(inc_prop_name_list_ofs, inc_prop_name_list_end, "inc_prop_name_list", "s", 55)
-        use(inc_prop_name_list_ofs, inc_prop_name_list_end)
 
     add_fixed(inc_cmd_list_ofs, inc_cmd_cnt, 8, "inc_cmd_list", "C")
     add_fixed(inc_cmd_name_index_list_ofs, inc_cmd_name_index_cnt, 8, "inc_cmd_name_index_list", "c")
@@ -452,18 +1236,17 @@ def build_sections(data: bytes):
     inc_cmd_name_list_end = scn_name_index_list_ofs if scn_name_index_list_ofs > inc_cmd_name_list_ofs else n
     if inc_cmd_name_list_ofs >= 0 and inc_cmd_name_list_end > inc_cmd_name_list_ofs:
         add(inc_cmd_name_list_ofs, inc_cmd_name_list_end, "inc_cmd_name_list", "n", 55)
-        use(inc_cmd_name_list_ofs, inc_cmd_name_list_end)
 
     add_fixed(scn_name_index_list_ofs, scn_name_index_cnt, 8, "scn_name_index_list", "N")
 
     scn_name_list_end = scn_data_index_list_ofs if scn_data_index_list_ofs > scn_name_list_ofs else scn_name_list_ofs
     if scn_name_list_ofs >= 0 and scn_name_list_end > scn_name_list_ofs:
         add(scn_name_list_ofs, scn_name_list_end, "scn_name_list", "S", 55)
-        use(scn_name_list_ofs, scn_name_list_end)
 
     add_fixed(scn_data_index_list_ofs, scn_data_index_cnt, 8, "scn_data_index_list", "I")
 
-    scn_data_idx = read_index_list(data, scn_data_index_list_ofs, scn_data_index_cnt, n) or []
+    with stage("index_list", max(0, scn_data_index_cnt) * 8):
+        scn_data_idx = read_index_list(data, scn_data_index_list_ofs, scn_data_index_cnt, n) or []
     scn_data_total = 0
     for o, s in scn_data_idx:
         if o >= 0 and s >= 0:
@@ -473,16 +1256,16 @@ def build_sections(data: bytes):
     scn_data_b = scn_data_list_ofs + scn_data_total
     if scn_data_total > 0 and scn_data_b > scn_data_a:
         add(scn_data_a, scn_data_b, "scn_data_list", "L", 70)
-        use(scn_data_a, scn_data_b)
-
-    scn_names, scn_name_w = build_string_table(
-        data,
-        scn_name_index_list_ofs,
-        scn_name_index_cnt,
-        scn_name_list_ofs,
-        scn_name_list_end,
-        n,
-    )
+
+    with stage("string_table", max(0, scn_name_list_end - scn_name_list_ofs)):
+        scn_names, scn_name_w = build_string_table(
+            data,
+            scn_name_index_list_ofs,
+            scn_name_index_cnt,
+            scn_name_list_ofs,
+            scn_name_list_end,
+            n,
+        )
     if scn_names is None:
         scn_names = []
         scn_name_w = None
@@ -496,7 +1279,6 @@ def build_sections(data: bytes):
         b = a + s
         nm = scn_names[i] if i < len(scn_names) else f"scene#{i}"
         add(a, b, nm, "F", 40)
-        use(a, b)
 
     os_dir_off = scn_data_b
     os_dir_sz = original_source_header_size if original_source_header_size and original_source_header_size > 0 else 0
@@ -505,33 +1287,35 @@ def build_sections(data: bytes):
 
     if os_dir_sz > 0 and 0 <= os_dir_off <= n - os_dir_sz:
         add(os_dir_off, os_dir_off + os_dir_sz, "original_source_size_list_data", "D", 75)
-        use(os_dir_off, os_dir_off + os_dir_sz)
-        sizes = td(data, os_dir_off, os_dir_sz)
-        how = "header" if sizes else how
-        if sizes is None:
-            sizes = vd(data[os_dir_off:os_dir_off + os_dir_sz], n, os_dir_off + os_dir_sz)
-            how = "plain" if sizes else how
+        with stage("os_dir", os_dir_sz):
+            sizes = td(data, os_dir_off, os_dir_sz)
+            how = "header" if sizes else how
+            if sizes is None:
+                sizes = vd(data[os_dir_off:os_dir_off + os_dir_sz], n, os_dir_off + os_dir_sz)
+                how = "plain" if sizes else how
 
     tail_start = scn_data_b
     if os_dir_sz > 0 and sizes:
         off = os_dir_off + os_dir_sz
         last = off
-        for i, sz in enumerate(sizes):
+        ranges = []
+        for sz in sizes:
             a, b = off, off + sz
             if a >= n:
                 break
             b = min(b, n)
-            nm = nf(data, a, b - a) or f"original_source#{i}"
-            add(a, b, nm, "O", 45)
-            use(a, b)
+            ranges.append((a, b))
             off += sz
             last = b
             if off > n:
                 break
+        with stage("names", calls=len(ranges)):
+            names = _entry_names(data, ranges, pool, path) if want_names else [None] * len(ranges)
+            for i, ((a, b), nm) in enumerate(zip(ranges, names)):
+                add(a, b, nm or f"original_source#{i}", "O", 45)
         tail_start = max(tail_start, last)
         if tail_start < n:
             add(tail_start, n, f"tail/extra (os:{how})", "T", 10)
-            use(tail_start, n)
     else:
         if os_dir_sz > 0 and 0 <= os_dir_off <= n:
             tail_start = max(tail_start, os_dir_off + os_dir_sz)
@@ -542,23 +1326,40 @@ def build_sections(data: bytes):
                 if how != "none":
                     nm += f" ({how})"
             add(tail_start, n, nm, "T", 10)
-            use(tail_start, n)
-
-    _, un, r = uu(n, used)
-    gaps = []
-    m_used = mr((cl(a, 0, n), cl(b, 0, n)) for a, b in used)
-    prev = 0
-    for a, b in m_used:
-        if a > prev:
-            gaps.append((prev, a))
-        prev = max(prev, b)
-    if prev < n:
-        gaps.append((prev, n))
-    for a, b in gaps:
-        if b > a:
-            secs.append([a, b, "G", 1, "gap/unknown", False])
-
-    secs_sorted = sorted(secs, key=lambda x: (x[0], x[1], -x[3], x[2], x[4]))
+
+    with stage("sort", calls=len(secs)):
+        secs = secs.sorted()
+
+    with stage("gaps", calls=len(secs)):
+        ma, mb = merge_sorted_ranges(secs.start, secs.end)
+        un = n - (sum(mb) - sum(ma))
+        r = un / n * 100.0 if n else 0.0
+        m = len(secs)
+        prev = 0
+        for a, b in zip(ma, mb):
+            if a > prev:
+                secs.append(prev, a, "G", 1, "gap/unknown")
+            prev = b
+        if prev < n:
+            secs.append(prev, n, "G", 1, "gap/unknown")
+        if len(secs) > m:
+            if on_section is not None:
+                for i in range(m, len(secs)):
+                    on_section(secs[i])
+            st = secs.start
+            idx = []
+            i, j = 0, m
+            while i < m and j < len(secs):
+                if st[j] < st[i]:
+                    idx.append(j)
+                    j += 1
+                else:
+                    idx.append(i)
+                    i += 1
+            idx += range(i, m)
+            idx += range(j, len(secs))
+            secs = secs.take(idx)
+
     meta = {
         "header_size": header_size,
         "scn_data_exe_angou_mod": scn_data_exe_angou_mod,
@@ -576,41 +1377,395 @@ def build_sections(data: bytes):
         "unused_bytes": un,
         "unused_pct": r,
     }
-    return secs_sorted, meta
+    return secs, meta
 
-def dump_all_sections(pck_path: str, out_dir: str) -> int:
-    if not os.path.exists(pck_path):
-        print("not found")
-        return 2
-    data = open(pck_path, "rb").read()
+CACHE_VERSION = 2
+FP_SAMPLE = 64 * 1024
+
+def cache_dir() -> str:
+    d = os.environ.get("SSD_CACHE_DIR")
+    if d:
+        return d
+    base = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(base, "ssd")
+
+def _cache_path(path: str) -> str:
+    k = hashlib.blake2b(os.path.abspath(path).encode("utf-8", "surrogateescape"), digest_size=16).hexdigest()
+    return os.path.join(cache_dir(), k + ".idx")
+
+def pck_fingerprint(path: str, data) -> list:
+    st = os.stat(path)
     n = len(data)
-    if n < 92:
-        print("too small")
-        return 1
+    h = hashlib.blake2b(digest_size=16)
+    for a in (0, max(0, n // 2 - FP_SAMPLE // 2), max(0, n - FP_SAMPLE)):
+        h.update(data[a:a + FP_SAMPLE])
+    return [n, st.st_mtime_ns, h.hexdigest()]
 
-    dt = datetime.now()
-    subdir_name = f"ss_{dt.strftime('%Y%m%d_%H%M%S')}"
-    base_out = os.path.join(out_dir, subdir_name)
-    os.makedirs(base_out, exist_ok=True)
+def _cache_read(path: str, fp):
+    try:
+        with open(_cache_path(path), "rb") as f:
+            rec = json.loads(zlib.decompress(f.read()))
+    except (OSError, ValueError, zlib.error):
+        return None
+    if rec.get("v") != CACHE_VERSION or rec.get("fp") != fp:
+        return None
+    return rec
 
-    secs, meta = build_sections(data)
+def _cache_write(path: str, rec) -> None:
+    p = _cache_path(path)
+    tmp = f"{p}.{os.getpid()}.tmp"
+    try:
+        os.makedirs(os.path.dirname(p), exist_ok=True)
+        with open(tmp, "wb") as f:
+            f.write(zlib.compress(json.dumps(rec, separators=(",", ":")).encode("utf-8"), 6))
+        os.replace(tmp, p)
+    except OSError:
+        try:
+            os.remove(tmp)
+        except OSError:
+            pass
 
-    dumped = 0
-    for row in secs:
-        a, b, sym, pr, name, ex = row
-        if b <= a:
-            row[5] = False
-            continue
+def invalidate_cache(path: str = None) -> int:
+    if path is not None:
+        targets = [_cache_path(path)]
+    else:
+        d = cache_dir()
         try:
-            out_path = _safe_join(base_out, name)
-            os.makedirs(os.path.dirname(out_path), exist_ok=True)
-            with open(out_path, "wb") as f:
-                f.write(data[a:b])
-            row[5] = True
-            dumped += 1
-        except Exception:
-            row[5] = False
+            targets = [os.path.join(d, x) for x in os.listdir(d) if x.endswith(".idx")]
+        except OSError:
+            targets = []
+    removed = 0
+    for p in targets:
+        try:
+            os.remove(p)
+            removed += 1
+        except OSError:
+            pass
+    return removed
+
+def load_sections(data, path: str, pool=None, use_cache: bool = True, flt=None, on_section=None):
+    secs, meta, _ = _load_index(data, path, pool, use_cache, flt, on_section, False)
+    return secs, meta
+
+def load_sections_digests(data, path: str, pool=None, use_cache: bool = True, flt=None):
+    return _load_index(data, path, pool, use_cache, flt, None, True)
+
+def _digests(data, secs):
+    with stage("digest", sum(secs.end) - sum(secs.start), len(secs)):
+        return [section_digest(data, a, b) for a, b in zip(secs.start, secs.end)]
+
+def _load_index(data, path: str, pool, use_cache: bool, flt, on_section, digests: bool):
+    want_names = flt is None or flt.needs_names
+    emit = on_section
+    if on_section is not None and flt is not None:
+        emit = lambda x: flt(x[2], x[4]) and on_section(x)
+    rec = None
+    if use_cache:
+        with stage("cache_read"):
+            fp = pck_fingerprint(path, data)
+            rec = _cache_read(path, fp)
+    if rec is not None:
+        secs, meta = SectionTable.from_columns(rec["secs"]), rec["meta"]
+        dig = rec.get("dig") if digests else None
+        if digests and len(dig or ()) != len(secs):
+            dig = rec["dig"] = _digests(data, secs)
+            with stage("cache_write", calls=len(secs)):
+                _cache_write(path, rec)
+        idx = _filter_idx(secs, flt)
+        if idx is not None:
+            secs = secs.take(idx)
+        if on_section is not None:
+            for x in secs:
+                on_section(x)
+    else:
+        with stage("map", len(data)):
+            secs, meta = build_sections(data, pool, path, want_names, emit)
+        dig = _digests(data, secs) if digests else None
+        if use_cache and want_names:
+            rec = {"v": CACHE_VERSION, "fp": fp, "secs": secs.columns(), "meta": meta}
+            if dig is not None:
+                rec["dig"] = dig
+            with stage("cache_write", calls=len(secs)):
+                _cache_write(path, rec)
+        idx = _filter_idx(secs, flt)
+        if idx is not None:
+            secs = secs.take(idx)
+    if idx is not None and dig is not None:
+        dig = [dig[i] for i in idx]
+    return secs, meta, dig
+
+class SectionFilter:
+    def __init__(self, include=(), exclude=(), syms: str = None):
+        self.include = [self._compile(p) for p in include or ()]
+        self.exclude = [self._compile(p) for p in exclude or ()]
+        self.syms = set(syms) if syms else None
+        self.needs_names = bool(self.include or self.exclude) or self.syms is None or "O" in self.syms
+
+    @staticmethod
+    def _compile(pat: str):
+        if pat.startswith("re:"):
+            return re.compile(pat[3:]).search
+        return re.compile(fnmatch.translate(pat.replace("\\", "/"))).match
+
+    def __call__(self, sym: str, name: str) -> bool:
+        if self.syms is not None and sym not in self.syms:
+            return False
+        name = name.replace("\\", "/")
+        if self.include and not any(m(name) for m in self.include):
+            return False
+        return not any(m(name) for m in self.exclude)
+
+def make_filter(include=(), exclude=(), syms: str = None):
+    if not include and not exclude and not syms:
+        return None
+    return SectionFilter(include, exclude, syms)
+
+def _filter_idx(secs, flt):
+    if flt is None:
+        return None
+    return [i for i, (sym, k) in enumerate(zip(secs.sym.decode("latin-1"), secs.nid)) if flt(sym, secs.names[k])]
+
+def section_digest(data, a: int, b: int) -> str:
+    return hashlib.blake2b(data[a:b], digest_size=16).hexdigest()
+
+ARCHIVE_CACHE_BYTES = 64 * 1024 * 1024
+
+class PckArchive:
+    def __init__(self, path: str, use_cache: bool = True, cache_bytes: int = ARCHIVE_CACHE_BYTES, pool=None):
+        self.path = path
+        self.use_cache = use_cache
+        self.cache_bytes = cache_bytes
+        self._pool = pool
+        self._pf = None
+        self._secs = None
+        self._meta = None
+        self._index = None
+        self._lock = threading.Lock()
+        self._lru = OrderedDict()
+        self._lru_bytes = 0
+
+    def _load(self):
+        if self._index is None:
+            with self._lock:
+                if self._index is None:
+                    pf = PckFile(self.path)
+                    if len(pf) < 92:
+                        pf.close()
+                        raise ValueError("too small")
+                    secs, meta = load_sections(pf.data, self.path, self._pool, self.use_cache)
+                    index = {}
+                    for i, k in enumerate(secs.nid):
+                        index.setdefault(secs.names[k], []).append(i)
+                    self._pf, self._secs, self._meta = pf, secs, meta
+                    self._index = index
+        return self._index
+
+    @property
+    def data(self):
+        self._load()
+        return self._pf.data
+
+    @property
+    def sections(self):
+        self._load()
+        return self._secs
+
+    @property
+    def meta(self):
+        self._load()
+        return self._meta
+
+    def names(self):
+        return list(self._load())
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._load()
+
+    def __len__(self):
+        return len(self._load())
+
+    def find(self, name: str, sym: str = None, index: int = 0):
+        if sym is not None and len(sym) != 1:
+            raise ValueError(f"bad sym {sym!r}")
+        ids = self._load().get(name)
+        if ids and sym is not None:
+            ids = [i for i in ids if self._secs.sym[i] == ord(sym)]
+        if not ids or not (0 <= index < len(ids)):
+            raise KeyError(name)
+        a, b, sym, pr, name, ex = self._secs[ids[index]]
+        return a, b, sym
+
+    def read_raw(self, name: str, sym: str = None, index: int = 0):
+        a, b, _ = self.find(name, sym, index)
+        return self.data[a:b]
+
+    def read_decoded(self, name: str, sym: str = None, index: int = 0) -> bytes:
+        a, b, sym = self.find(name, sym, index)
+        if sym not in ("O", "D"):
+            raise ValueError(f"{name}: section {sym} is not an encrypted resource")
+        hit = self._lru_get((a, b))
+        if hit is not None:
+            return hit
+        _, payload = decrypt_and_decompress_resource_safe(bytearray(self.data[a:b]))
+        self._lru_put((a, b), payload)
+        return payload
+
+    def decode_to(self, name: str, sink, sym: str = None, index: int = 0) -> int:
+        a, b, sym = self.find(name, sym, index)
+        if sym not in ("O", "D"):
+            raise ValueError(f"{name}: section {sym} is not an encrypted resource")
+        hit = self._lru_get((a, b))
+        if hit is not None:
+            sink(hit)
+            return len(hit)
+        _, n = decode_resource_to(bytearray(self.data[a:b]), sink)
+        return n
+
+    def _lru_get(self, key):
+        with self._lock:
+            hit = self._lru.get(key)
+            if hit is not None:
+                self._lru.move_to_end(key)
+            return hit
+
+    def _lru_put(self, key, payload: bytes) -> None:
+        if len(payload) > self.cache_bytes:
+            return
+        with self._lock:
+            if key in self._lru:
+                return
+            self._lru[key] = payload
+            self._lru_bytes += len(payload)
+            while self._lru_bytes > self.cache_bytes:
+                _, old = self._lru.popitem(last=False)
+                self._lru_bytes -= len(old)
+
+    def read(self, name: str, decoded: bool = False, sym: str = None, index: int = 0):
+        if decoded:
+            return self.read_decoded(name, sym, index)
+        return self.read_raw(name, sym, index)
+
+    def close(self) -> None:
+        with self._lock:
+            self._lru.clear()
+            self._lru_bytes = 0
+            if self._pf is not None:
+                self._pf.close()
+            self._pf = None
+            self._index = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+MANIFEST_NAME = ".ssd_manifest.json"
+
+def _read_manifest(base_out: str):
+    try:
+        with open(os.path.join(base_out, MANIFEST_NAME), "r", encoding="utf-8") as f:
+            m = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if not isinstance(m, dict) or m.get("v") != 1 or not isinstance(m.get("files"), dict):
+        return None
+    return m
+
+def _write_manifest(base_out: str, m) -> None:
+    p = os.path.join(base_out, MANIFEST_NAME)
+    with open(p + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(m, f, ensure_ascii=False, separators=(",", ":"))
+    os.replace(p + ".tmp", p)
+
+def _incremental_plan(base_out: str, secs, dig, decode: bool, flt=None):
+    old = _read_manifest(base_out)
+    old_files = old["files"] if old else {}
+    last = {}
+    for i, k in enumerate(secs.nid):
+        last[_name_to_relpath(secs.names[k])] = i
+    keep = {}
+    write = set()
+    st = {"added": 0, "changed": 0, "unchanged": 0, "removed": 0}
+    for rel, i in last.items():
+        a, b, sym, pr, name, ex = secs[i]
+        ent = [name, sym, b - a, dig[i], decode and sym == "O"]
+        keep[rel] = ent
+        prev = old_files.get(rel)
+        if prev == ent and os.path.isfile(_safe_join(base_out, rel)):
+            st["unchanged"] += 1
+            secs.ex[i] = True
+        else:
+            st["changed" if prev is not None else "added"] += 1
+            write.add(i)
+    stale = []
+    for rel, ent in old_files.items():
+        if rel in keep:
+            continue
+        if flt is not None and not flt(ent[1], ent[0]):
+            keep[rel] = ent
+        else:
+            stale.append(rel)
+    return write, keep, st, stale
 
+def _remove_stale(base_out: str, stale) -> int:
+    removed = 0
+    base = os.path.abspath(base_out)
+    for rel in stale:
+        try:
+            p = _safe_join(base_out, rel)
+            os.remove(p)
+            removed += 1
+        except (OSError, ValueError):
+            continue
+        d = os.path.dirname(p)
+        while d != base and d.startswith(base + os.sep):
+            try:
+                os.rmdir(d)
+            except OSError:
+                break
+            d = os.path.dirname(d)
+    return removed
+
+FORMATS = ("text", "json", "ndjson", "csv")
+MAP_FIELDS = ("kind", "sym", "start", "end", "size", "name", "value")
+DIFF_FIELDS = ("sym", "start1", "start2", "size1", "size2", "name")
+
+def _sec_rec(sec):
+    a, b, sym, pr, name, ex = sec
+    return {"sym": sym, "start": a, "end": b, "size": b - a, "name": name}
+
+def _meta_rows(pck_path: str, n: int, meta):
+    yield {"kind": "meta", "name": "file", "value": pck_path}
+    yield {"kind": "meta", "name": "size", "value": n}
+    for k, v in meta.items():
+        yield {"kind": "meta", "name": k, "value": v}
+
+def _emit_ndjson(rec, out=None) -> None:
+    (out or sys.stdout).write(json.dumps(rec, ensure_ascii=False) + "\n")
+
+def _emit_csv(rows, fields, out=None) -> None:
+    w = csv.DictWriter(out or sys.stdout, fieldnames=fields, extrasaction="ignore", lineterminator="\n")
+    w.writeheader()
+    for r in rows:
+        w.writerow(r)
+
+def _emit_json(doc, out=None) -> None:
+    out = out or sys.stdout
+    out.write("{")
+    for i, (k, v) in enumerate(doc.items()):
+        out.write(("," if i else "") + "\n " + json.dumps(k) + ": ")
+        if v is None or isinstance(v, (dict, list, str, int, float)):
+            out.write(json.dumps(v, ensure_ascii=False))
+            continue
+        out.write("[")
+        j = -1
+        for j, x in enumerate(v):
+            out.write(("," if j else "") + "\n  " + json.dumps(x, ensure_ascii=False))
+        out.write("\n ]" if j >= 0 else "]")
+    out.write("\n}\n")
+
+def _print_map_header(pck_path: str, n: int, meta) -> None:
     print("==== PCK Section Map ====")
     print(f"file: {pck_path}")
     print(f"size: {n} bytes ({hx(n)})")
@@ -625,47 +1780,368 @@ def dump_all_sections(pck_path: str, out_dir: str) -> int:
     if meta["os_dir_sz"] > 0:
         print(f"original_source_partition: dir_off={hx(meta['os_dir_off'])} dir_size={meta['os_dir_sz']} entries={meta['os_entries']} via {meta['os_how']}")
     print(f"unused(by ranges): {meta['unused_bytes']} bytes ({meta['unused_pct']:.2f}%)")
-    print(f"dumped: {dumped}/{len([x for x in secs if x[1] > x[0]])} -> {base_out}")
-    print()
 
+def _print_sections(secs, extracted: bool) -> None:
     print("==== Sections (ranges) ====")
-    print(f"{'SYM':>3}  {'START':<10}  {'LAST':<10}  {'SIZE':>10}  {'EXTRACTED':<9}  {'NAME':<{NAME_W}}")
-    print(f"{'-'*3}  {'-'*10}  {'-'*10}  {'-'*10}  {'-'*9}  {'-'*NAME_W}")
+    if extracted:
+        print(f"{'SYM':>3}  {'START':<10}  {'LAST':<10}  {'SIZE':>10}  {'EXTRACTED':<9}  {'NAME':<{NAME_W}}")
+        print(f"{'-'*3}  {'-'*10}  {'-'*10}  {'-'*10}  {'-'*9}  {'-'*NAME_W}")
+    else:
+        print(f"{'SYM':>3}  {'START':<10}  {'LAST':<10}  {'SIZE':>10}  NAME")
+        print(f"{'-'*3}  {'-'*10}  {'-'*10}  {'-'*10}  {'-'*NAME_W}")
     for a, b, sym, pr, name, ex in secs:
-        if b <= a:
-            continue
-        print(f"{sym:>3}  {hx(a):<10}  {hx(b-1):<10}  {b-a:10d}  {str(bool(ex)):<9}  {_dn(name):<{NAME_W}}")
+        if extracted:
+            print(f"{sym:>3}  {hx(a):<10}  {hx(b-1):<10}  {b-a:10d}  {str(bool(ex)):<9}  {_dn(name):<{NAME_W}}")
+        else:
+            print(f"{sym:>3}  {hx(a):<10}  {hx(b-1):<10}  {b-a:10d}  {name}")
 
+def list_sections(pck_path: str, jobs: int = 1, use_cache: bool = True, fmt: str = "text", flt=None) -> int:
+    if not os.path.exists(pck_path):
+        print("not found")
+        return 2
+    pool = make_pool(jobs)
+    try:
+        with PckFile(pck_path) as pf:
+            n = len(pf.data)
+            if n < 92:
+                print("too small")
+                return 1
+            if fmt == "ndjson":
+                _emit_ndjson({"kind": "file", "file": pck_path, "size": n})
+                _, meta = load_sections(pf.data, pck_path, pool, use_cache, flt, lambda x: _emit_ndjson({"kind": "section", **_sec_rec(x)}))
+                _emit_ndjson({"kind": "meta", "file": pck_path, "size": n, "meta": meta})
+                return 0
+            secs, meta = load_sections(pf.data, pck_path, pool, use_cache, flt)
+    finally:
+        if pool is not None:
+            pool.shutdown()
+    if fmt == "json":
+        _emit_json({"file": pck_path, "size": n, "meta": meta, "sections": (_sec_rec(x) for x in secs)})
+        return 0
+    if fmt == "csv":
+        _emit_csv(itertools.chain(({"kind": "section", **_sec_rec(x)} for x in secs), _meta_rows(pck_path, n, meta)), MAP_FIELDS)
+        return 0
+    _print_map_header(pck_path, n, meta)
+    print()
+    _print_sections(secs, False)
     return 0
 
-def compare_pcks(p1: str, p2: str) -> int:
-    if not os.path.exists(p1) or not os.path.exists(p2):
+def dump_all_sections(pck_path: str, out_dir: str, jobs: int = 1, decode: bool = False, use_cache: bool = True, incremental: bool = False, io_threads: int = IO_THREADS, mem_limit: int = IO_MEM_LIMIT, flt=None, fmt: str = "text", archive: str = None) -> int:
+    if not os.path.exists(pck_path):
         print("not found")
         return 2
-    d1 = open(p1, "rb").read()
-    d2 = open(p2, "rb").read()
-    if len(d1) < 92 or len(d2) < 92:
+    pool = make_pool(jobs)
+    try:
+        with PckFile(pck_path) as pf:
+            return _dump_all_sections(pf, pck_path, out_dir, pool, decode, use_cache, incremental, io_threads, mem_limit, flt, fmt, archive)
+    finally:
+        if pool is not None:
+            pool.shutdown()
+
+def export_sections(pf: PckFile, pck_path: str, base_out: str, pool=None, decode: bool = False, use_cache: bool = True, incremental: bool = False, io_threads: int = IO_THREADS, mem_limit: int = IO_MEM_LIMIT, flt=None):
+    data = pf.data
+    os.makedirs(base_out, exist_ok=True)
+
+    inc = None
+    if incremental:
+        secs, meta, dig = load_sections_digests(data, pck_path, pool, use_cache, flt)
+        inc = _incremental_plan(base_out, secs, dig, decode, flt)
+    else:
+        secs, meta = load_sections(data, pck_path, pool, use_cache, flt)
+
+    last = {}
+    for i, k in enumerate(secs.nid):
+        last[_name_to_relpath(secs.names[k])] = i
+
+    dumped = 0
+    todo = []
+    futs = []
+    shadowed = []
+    writer = SectionWriter(io_threads, mem_limit, pf)
+    for i, (a, b, sym, pr, name, ex) in enumerate(secs):
+        w = last[_name_to_relpath(name)]
+        if w != i:
+            shadowed.append((i, w))
+            continue
+        if inc is not None and i not in inc[0]:
+            dumped += ex
+            continue
+        if decode and sym == "O":
+            todo.append(i)
+            continue
+        try:
+            futs.append((i, writer.write_range(_safe_join(base_out, name), a, b)))
+        except ValueError as e:
+            writer.errors.append((name, str(e)))
+            secs.ex[i] = False
+    items = [(secs.start[i], secs.end[i], base_out, secs.name(i)) for i in todo]
+    with stage("decode", sum(b - a for a, b, *_ in items), len(items)):
+        pend = list(zip(todo, decode_entries(data, items, pool, pck_path, writer)))
+    with stage("write_wait"):
+        writer.close()
+    for i, fut in futs:
+        secs.ex[i] = fut.result()
+        dumped += secs.ex[i]
+
+    decoded = []
+    for i, (name, out_sz, dt_s, err, fut) in pend:
+        if err is None and fut is not None and not fut.result():
+            err = "write failed"
+        secs.ex[i] = err is None
+        dumped += secs.ex[i]
+        decoded.append((secs.end[i] - secs.start[i], name, out_sz, dt_s, err))
+
+    for i, w in shadowed:
+        secs.ex[i] = secs.ex[w]
+        dumped += secs.ex[i]
+
+    if inc is not None:
+        write, keep, st, stale = inc
+        for i in write:
+            if not secs.ex[i]:
+                keep.pop(_name_to_relpath(secs.name(i)), None)
+        st["removed"] = _remove_stale(base_out, stale)
+        _write_manifest(base_out, {"v": 1, "decode": decode, "files": keep})
+
+    return {
+        "secs": secs,
+        "meta": meta,
+        "dumped": dumped,
+        "total": len(secs),
+        "decoded": decoded,
+        "errors": writer.errors,
+        "inc": inc[2] if inc is not None else None,
+    }
+
+class _MemReader:
+    def __init__(self, buf):
+        self.mv = memoryview(buf)
+        self.pos = 0
+
+    def read(self, n: int = -1):
+        a = self.pos
+        self.pos = len(self.mv) if n is None or n < 0 else min(len(self.mv), a + n)
+        return self.mv[a:self.pos]
+
+class ArchiveWriter:
+    def __init__(self, dest: str, mtime: float = None):
+        self.mtime = time.time() if mtime is None else mtime
+        self._tar = self._zip = None
+        low = dest.lower()
+        if dest == "-":
+            self._tar = tarfile.open(fileobj=sys.stdout.buffer, mode="w|", format=tarfile.PAX_FORMAT)
+        elif low.endswith(".zip"):
+            self._zip = zipfile.ZipFile(dest, "w", zipfile.ZIP_STORED, allowZip64=True)
+        else:
+            mode = "w"
+            for ext, m in ((".tar.gz", "w:gz"), (".tgz", "w:gz"), (".tar.bz2", "w:bz2"), (".tar.xz", "w:xz")):
+                if low.endswith(ext):
+                    mode = m
+            self._tar = tarfile.open(dest, mode, format=tarfile.PAX_FORMAT)
+        if self._tar is not None:
+            self._tar.copybufsize = LZSS_CHUNK
+
+    def add(self, name: str, src, size: int = None) -> None:
+        if size is None:
+            size = len(src)
+        if self._tar is not None:
+            ti = tarfile.TarInfo(name)
+            ti.size = size
+            ti.mtime = int(self.mtime)
+            self._tar.addfile(ti, src if hasattr(src, "read") else _MemReader(src))
+            return
+        zi = zipfile.ZipInfo(name, time.localtime(max(self.mtime, 315532800))[:6])
+        zi.file_size = size
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", UserWarning)
+            with self._zip.open(zi, "w", force_zip64=size >= zipfile.ZIP64_LIMIT) as w:
+                if hasattr(src, "read"):
+                    shutil.copyfileobj(src, w, LZSS_CHUNK)
+                else:
+                    w.write(src)
+
+    def close(self) -> None:
+        (self._tar or self._zip).close()
+
+def _archive_payload(data, a: int, b: int, fallback: str):
+    t0 = time.perf_counter()
+    try:
+        fn, combined = decrypt_resource(bytearray(data[a:b]))
+        if lzss_size(combined) > LZSS_STREAM_MIN:
+            return fn or fallback, None, time.perf_counter() - t0, None, combined
+        return fn or fallback, decompress_resource(combined), time.perf_counter() - t0, None, None
+    except Exception as e:
+        return fallback, None, time.perf_counter() - t0, f"{type(e).__name__}: {e}", None
+
+def _w_payloads(path: str, items):
+    data = _w_data(path)
+    return [_archive_payload(data, *it) for it in items]
+
+def archive_sections(pf: PckFile, pck_path: str, dest: str, pool=None, decode: bool = False, use_cache: bool = True, flt=None):
+    data = pf.data
+    secs, meta = load_sections(data, pck_path, pool, use_cache, flt)
+    items = [(a, b, name) for a, b, sym, pr, name, ex in secs if decode and sym == "O"]
+    if pool is None:
+        payloads = (_archive_payload(data, *it) for it in items)
+    else:
+        payloads = pool_map(pool, _w_payloads, pck_path, items, lambda c: [_archive_payload(data, *it) for it in c], 1, pool._max_workers * 2)
+
+    ar = ArchiveWriter(dest, os.stat(pck_path).st_mtime)
+    dumped = 0
+    decoded = []
+    try:
+        for i, (a, b, sym, pr, name, ex) in enumerate(secs):
+            if not (decode and sym == "O"):
+                with stage("write", b - a):
+                    ar.add(_name_to_relpath(name), data[a:b])
+                secs.ex[i] = True
+                dumped += 1
+                continue
+            fn, payload, dt_s, err, combined = next(payloads)
+            out_sz = 0
+            if err is None and payload is None:
+                with tempfile.SpooledTemporaryFile(LZSS_STREAM_MIN) as tmp:
+                    try:
+                        out_sz = decompress_resource_to(combined, tmp.write)
+                    except Exception as e:
+                        err = f"{type(e).__name__}: {e}"
+                    else:
+                        tmp.seek(0)
+                        with stage("write", out_sz):
+                            ar.add(_name_to_relpath(fn), tmp, out_sz)
+            elif err is None:
+                out_sz = len(payload)
+                with stage("write", out_sz):
+                    ar.add(_name_to_relpath(fn), payload)
+            secs.ex[i] = err is None
+            dumped += secs.ex[i]
+            decoded.append((b - a, fn, out_sz, dt_s, err))
+    finally:
+        ar.close()
+
+    return {
+        "secs": secs,
+        "meta": meta,
+        "dumped": dumped,
+        "total": len(secs),
+        "decoded": decoded,
+        "errors": [],
+        "inc": None,
+    }
+
+def _export_records(pck_path: str, n: int, base_out: str, res, fmt: str) -> None:
+    secs, meta = res["secs"], res["meta"]
+    sec_recs = ({**_sec_rec(x), "extracted": bool(x[5])} for x in secs)
+    dec_recs = ({"name": name, "raw": raw, "size": out_sz, "ms": round(dt_s * 1000, 3), "ok": err is None, "error": err} for raw, name, out_sz, dt_s, err in res["decoded"])
+    summary = {"out": base_out, "dumped": res["dumped"], "total": res["total"], "write_errors": [{"path": p, "error": e} for p, e in res["errors"]], "incremental": res["inc"]}
+    if fmt == "json":
+        _emit_json({"file": pck_path, "size": n, "meta": meta, **summary, "sections": sec_recs, "decoded": dec_recs})
+    elif fmt == "ndjson":
+        _emit_ndjson({"kind": "file", "file": pck_path, "size": n})
+        for r in sec_recs:
+            _emit_ndjson({"kind": "section", **r})
+        for r in dec_recs:
+            _emit_ndjson({"kind": "decoded", **r})
+        _emit_ndjson({"kind": "meta", "file": pck_path, "size": n, "meta": meta, **summary})
+    else:
+        rows = itertools.chain(
+            ({"kind": "section", **r, "value": r["extracted"]} for r in sec_recs),
+            ({"kind": "decoded", "name": r["name"], "size": r["size"], "value": "ok" if r["ok"] else r["error"]} for r in dec_recs),
+            _meta_rows(pck_path, n, meta),
+            ({"kind": "meta", "name": k, "value": json.dumps(v) if isinstance(v, (list, dict)) else v} for k, v in summary.items()),
+        )
+        _emit_csv(rows, MAP_FIELDS)
+
+def _dump_all_sections(pf: PckFile, pck_path: str, out_dir: str, pool=None, decode: bool = False, use_cache: bool = True, incremental: bool = False, io_threads: int = IO_THREADS, mem_limit: int = IO_MEM_LIMIT, flt=None, fmt: str = "text", archive: str = None) -> int:
+    n = len(pf.data)
+    if n < 92:
         print("too small")
         return 1
 
-    s1, _ = build_sections(d1)
-    s2, _ = build_sections(d2)
+    if archive:
+        try:
+            res = archive_sections(pf, pck_path, archive, pool, decode, use_cache, flt)
+        except (OSError, tarfile.TarError, zipfile.BadZipFile) as e:
+            print(f"archive write failed: {e}", file=sys.stderr)
+            return 1
+        with contextlib.redirect_stdout(sys.stderr) if archive == "-" else contextlib.nullcontext():
+            return _print_export(pck_path, n, archive, res, decode, fmt)
+
+    if incremental:
+        base_out = out_dir
+    else:
+        dt = datetime.now()
+        subdir_name = f"ss_{dt.strftime('%Y%m%d_%H%M%S')}"
+        base_out = os.path.join(out_dir, subdir_name)
+
+    res = export_sections(pf, pck_path, base_out, pool, decode, use_cache, incremental, io_threads, mem_limit, flt)
+    return _print_export(pck_path, n, base_out, res, decode, fmt)
+
+def _print_export(pck_path: str, n: int, base_out: str, res, decode: bool, fmt: str = "text") -> int:
+    if fmt != "text":
+        _export_records(pck_path, n, base_out, res, fmt)
+        return 0
+    secs, meta, decoded, errors = res["secs"], res["meta"], res["decoded"], res["errors"]
 
-    def group(secs):
-        m = {}
-        for a, b, sym, pr, name, ex in secs:
-            k = (sym, name)
-            m.setdefault(k, []).append((a, b))
-        for k in m:
-            m[k].sort()
-        return m
+    _print_map_header(pck_path, n, meta)
+    print(f"dumped: {res['dumped']}/{res['total']} -> {base_out}")
+    if errors:
+        print(f"write errors: {len(errors)} (first: {errors[0][0]}: {errors[0][1]})")
+    print()
+    _print_sections(secs, True)
+
+    if decode:
+        print()
+        print("==== Decoded (original_source) ====")
+        print(f"{'RAW':>10}  {'DECODED':>10}  {'MS':>8}  {'STATUS':<6}  {'NAME':<{NAME_W}}")
+        print(f"{'-'*10}  {'-'*10}  {'-'*8}  {'-'*6}  {'-'*NAME_W}")
+        for raw, name, out_sz, dt_s, err in decoded:
+            print(f"{raw:10d}  {out_sz:10d}  {dt_s * 1000:8.2f}  {'ok' if err is None else 'FAIL':<6}  {_dn(name):<{NAME_W}}")
+            if err is not None:
+                print(f"{'':>42}{err}")
+        ok = sum(1 for x in decoded if x[4] is None)
+        print(f"decoded: {ok}/{len(decoded)}  raw={sum(x[0] for x in decoded)}  out={sum(x[2] for x in decoded)}  time={sum(x[3] for x in decoded):.3f}s")
+
+    if res["inc"] is not None:
+        st = res["inc"]
+        print()
+        print(f"incremental: added={st['added']}  changed={st['changed']}  unchanged={st['unchanged']}  removed={st['removed']}")
 
-    g1 = group(s1)
-    g2 = group(s2)
+    return 0
+
+def compare_pcks(p1: str, p2: str, *more: str, jobs: int = 1, use_cache: bool = True, show_all: bool = False, fmt: str = "text", chunks: bool = False, decode: bool = False) -> int:
+    paths = [p1, p2, *more]
+    if not all(os.path.exists(p) for p in paths):
+        print("not found")
+        return 2
+    pool = make_pool(jobs)
+    try:
+        if more or show_all:
+            return _compare_matrix(paths, pool, use_cache, show_all, fmt)
+        with PckFile(p1) as f1, PckFile(p2) as f2:
+            return _compare_pcks(f1.data, f2.data, p1, p2, pool, use_cache, fmt, chunks, decode)
+    finally:
+        if pool is not None:
+            pool.shutdown()
+
+def _group_sections(secs, dig):
+    m = {}
+    names = secs.names
+    for a, b, sym, k, h in zip(secs.start, secs.end, secs.sym.decode("latin-1"), secs.nid, dig):
+        m.setdefault((sym, names[k]), []).append((a, b, h))
+    return m
+
+def compare_sections(d1, d2, p1: str, p2: str, pool=None, use_cache: bool = True):
+    s1, _, h1 = load_sections_digests(d1, p1, pool, use_cache)
+    s2, _, h2 = load_sections_digests(d2, p2, pool, use_cache)
+
+    with stage("compare", calls=len(s1) + len(s2)):
+        return _diff_sections(_group_sections(s1, h1), _group_sections(s2, h2))
+
+def _diff_sections(g1, g2):
     keys = sorted(set(g1.keys()) | set(g2.keys()), key=lambda x: (x[0], x[1]))
 
     diff_rows = []
-    all_same = True
 
     for sym, name in keys:
         l1 = g1.get((sym, name), [])
@@ -676,7 +2152,7 @@ def compare_pcks(p1: str, p2: str) -> int:
             r2 = l2[i] if i < len(l2) else None
 
             if r1:
-                a1, b1 = r1
+                a1, b1, _ = r1
                 s1z = b1 - a1
                 st1 = hx(a1)
             else:
@@ -685,7 +2161,7 @@ def compare_pcks(p1: str, p2: str) -> int:
                 st1 = "-"
 
             if r2:
-                a2, b2 = r2
+                a2, b2, _ = r2
                 s2z = b2 - a2
                 st2 = hx(a2)
             else:
@@ -693,50 +2169,1113 @@ def compare_pcks(p1: str, p2: str) -> int:
                 s2z = 0
                 st2 = "-"
 
-            same = False
-            if r1 and r2 and s1z == s2z:
-                if a1 >= 0 and b1 <= len(d1) and a2 >= 0 and b2 <= len(d2):
-                    same = (d1[a1:b1] == d2[a2:b2])
+            same = bool(r1 and r2 and s1z == s2z and r1[2] == r2[2])
 
             if not same:
-                all_same = False
                 addr = a1 if r1 else (a2 if r2 else 0)
                 nm = name if i == 0 else f"{name}#{i}"
                 diff_rows.append((addr, sym, st1, st2, s1z, s2z, nm))
 
+    diff_rows.sort(key=lambda t: t[0])
+    return diff_rows
+
+def _diff_rec(row):
+    addr, sym, st1, st2, s1z, s2z, nm = row
+    return {"sym": sym, "start1": None if st1 == "-" else int(st1, 16), "start2": None if st2 == "-" else int(st2, 16), "size1": s1z, "size2": s2z, "name": nm}
+
+CDC_MIN = 2 * 1024
+CDC_MAX = 64 * 1024
+CDC_MASK = (1 << 13) - 1
+CDC_WIN = 13
+CDC_BLOCK = 4 * 1024 * 1024
+CMP_BLOCK = 64 * 1024
+CHUNK_FIELDS = DIFF_FIELDS + ("op", "off1", "len1", "off2", "len2")
+
+_GEAR = tuple(int.from_bytes(hashlib.blake2b(bytes([i]), digest_size=4).digest(), "little") & CDC_MASK for i in range(256))
+
+def _gear_hits(buf):
+    n = len(buf)
+    if _np is None:
+        return None
+    g = _np.array(_GEAR, dtype=_np.uint16)
+    hits = []
+    for p in range(0, n, CDC_BLOCK):
+        q = max(0, p - CDC_WIN + 1)
+        v = g[_np.frombuffer(buf[q:p + CDC_BLOCK], dtype=_np.uint8)]
+        h = v.copy()
+        for k in range(1, CDC_WIN):
+            h[k:] += v[:-k] << k
+        h &= CDC_MASK
+        hits += (_np.flatnonzero(h[p - q:] == 0) + (p + 1)).tolist()
+    return hits
+
+def gear_cuts(buf, lo: int = CDC_MIN, hi: int = CDC_MAX) -> list:
+    n = len(buf)
+    hits = _gear_hits(buf) if n > lo else None
+    g = _GEAR
+    cuts = []
+    s = j = 0
+    while n - s > lo:
+        end = min(s + hi, n)
+        if hits is not None:
+            j = bisect.bisect_left(hits, s + lo, j)
+            c = min(hits[j], end) if j < len(hits) else end
+        else:
+            e = s + lo - 1
+            h = 0
+            for b in bytes(buf[e - CDC_WIN + 1:e]):
+                h = ((h << 1) + g[b]) & CDC_MASK
+            c = end
+            for k, b in enumerate(bytes(buf[e:end]), e + 1):
+                h = ((h << 1) + g[b]) & CDC_MASK
+                if not h:
+                    c = k
+                    break
+        cuts.append(c)
+        s = c
+    if s < n:
+        cuts.append(n)
+    return cuts
+
+def _common_prefix(x, y, limit: int) -> int:
+    i = 0
+    k = CMP_BLOCK
+    while i < limit:
+        k = min(k, limit - i)
+        if x[i:i + k] == y[i:i + k]:
+            i += k
+        elif k > 64:
+            k //= 8
+        else:
+            return i + next(t for t in range(k) if x[i + t] != y[i + t])
+    return i
+
+def _common_suffix(x, y, limit: int) -> int:
+    i = 0
+    n1, n2 = len(x), len(y)
+    k = CMP_BLOCK
+    while i < limit:
+        k = min(k, limit - i)
+        if x[n1 - i - k:n1 - i] == y[n2 - i - k:n2 - i]:
+            i += k
+        elif k > 64:
+            k //= 8
+        else:
+            return i + next(t for t in range(k) if x[n1 - i - 1 - t] != y[n2 - i - 1 - t])
+    return i
+
+def _tighten(x, y, a1: int, b1: int, a2: int, b2: int):
+    p = _common_prefix(x[a1:b1], y[a2:b2], min(b1 - a1, b2 - a2))
+    a1 += p
+    a2 += p
+    q = _common_suffix(x[a1:b1], y[a2:b2], min(b1 - a1, b2 - a2))
+    b1 -= q
+    b2 -= q
+    op = "replace" if b1 > a1 and b2 > a2 else "delete" if b1 > a1 else "insert"
+    return op, a1, b1 - a1, a2, b2 - a2
+
+def chunk_diff(x, y, lo: int = CDC_MIN, hi: int = CDC_MAX) -> list:
+    x, y = memoryview(x), memoryview(y)
+    n1, n2 = len(x), len(y)
+    p = _common_prefix(x, y, min(n1, n2))
+    q = _common_suffix(x[p:], y[p:], min(n1, n2) - p)
+    if p == n1 == n2:
+        return []
+    x1, y1 = x[p:n1 - q], y[p:n2 - q]
+    c1, c2 = gear_cuts(x1, lo, hi), gear_cuts(y1, lo, hi)
+    k1 = [0] + c1
+    k2 = [0] + c2
+    h1 = [hashlib.blake2b(x1[a:b], digest_size=8).digest() for a, b in zip(k1, c1)]
+    h2 = [hashlib.blake2b(y1[a:b], digest_size=8).digest() for a, b in zip(k2, c2)]
+    out = []
+    for tag, i1, j1, i2, j2 in difflib.SequenceMatcher(None, h1, h2, autojunk=False).get_opcodes():
+        if tag == "equal":
+            continue
+        op, a1, s1, a2, s2 = _tighten(x1, y1, k1[i1], k1[j1], k2[i2], k2[j2])
+        out.append((op, a1 + p, s1, a2 + p, s2))
+    return out
+
+def _section_payload(data, sym: str, a: int, b: int, decode: bool):
+    if not (decode and sym == "O"):
+        return memoryview(data)[a:b], False
+    fn, combined = decrypt_resource(bytearray(data[a:b]))
+    return decompress_resource(combined), True
+
+def _chunk_diff_item(d1, d2, sym: str, a1: int, b1: int, a2: int, b2: int, decode: bool):
+    try:
+        x, dec = _section_payload(d1, sym, a1, b1, decode)
+        y, _ = _section_payload(d2, sym, a2, b2, decode)
+        with stage("chunk_diff", len(x) + len(y)):
+            return len(x), len(y), dec, chunk_diff(x, y), None
+    except Exception as e:
+        return 0, 0, False, [], f"{type(e).__name__}: {e}"
+
+def _w_chunk_diff(path: str, items):
+    d1 = _w_data(path)
+    return [_chunk_diff_item(d1, _w_data(p2), *it) for p2, *it in items]
+
+def chunk_diff_rows(d1, d2, p1: str, p2: str, diff_rows, pool=None, decode: bool = False):
+    items = []
+    for addr, sym, st1, st2, s1z, s2z, nm in diff_rows:
+        if st1 != "-" and st2 != "-":
+            a1, a2 = int(st1, 16), int(st2, 16)
+            items.append((p2, sym, a1, a1 + s1z, a2, a2 + s2z, decode))
+    if pool is None:
+        res = (_chunk_diff_item(d1, d2, *it[1:]) for it in items)
+    else:
+        res = pool_map(pool, _w_chunk_diff, p1, items, lambda c: [_chunk_diff_item(d1, d2, *it[1:]) for it in c], 1)
+    res = iter(res)
+    return [next(res) if st1 != "-" and st2 != "-" else None for addr, sym, st1, st2, s1z, s2z, nm in diff_rows]
+
+def _chunk_recs(cd):
+    return [{"op": op, "off1": o1, "len1": n1, "off2": o2, "len2": n2} for op, o1, n1, o2, n2 in cd[3]]
+
+def _compare_pcks(d1, d2, p1: str, p2: str, pool=None, use_cache: bool = True, fmt: str = "text", chunks: bool = False, decode: bool = False) -> int:
+    if len(d1) < 92 or len(d2) < 92:
+        print("too small")
+        return 1
+
+    diff_rows = compare_sections(d1, d2, p1, p2, pool, use_cache)
+    cds = chunk_diff_rows(d1, d2, p1, p2, diff_rows, pool, decode) if chunks else [None] * len(diff_rows)
+
+    def rec(r, cd):
+        d = _diff_rec(r)
+        if cd is not None:
+            d.update(decoded=cd[2], len1=cd[0], len2=cd[1], ranges=_chunk_recs(cd), error=cd[4])
+        return d
+
+    if fmt == "json":
+        _emit_json({"pck1": p1, "size1": len(d1), "pck2": p2, "size2": len(d2), "identical": not diff_rows, "diffs": map(rec, diff_rows, cds)})
+        return 0
+    if fmt == "ndjson":
+        _emit_ndjson({"kind": "pack", "index": 1, "file": p1, "size": len(d1)})
+        _emit_ndjson({"kind": "pack", "index": 2, "file": p2, "size": len(d2)})
+        for r, cd in zip(diff_rows, cds):
+            _emit_ndjson({"kind": "diff", **rec(r, cd)})
+        _emit_ndjson({"kind": "summary", "identical": not diff_rows, "diffs": len(diff_rows)})
+        return 0
+    if fmt == "csv":
+        if chunks:
+            _emit_csv(({**_diff_rec(r), **c} for r, cd in zip(diff_rows, cds) for c in (_chunk_recs(cd) if cd else [{}]) or [{}]), CHUNK_FIELDS)
+        else:
+            _emit_csv(map(_diff_rec, diff_rows), DIFF_FIELDS)
+        return 0
+
     print("==== PCK Compare ====")
     print(f"pck1: {p1}  size={len(d1)} ({hx(len(d1))})")
     print(f"pck2: {p2}  size={len(d2)} ({hx(len(d2))})")
     print()
 
-    if all_same:
+    if not diff_rows:
         print("They are identical!")
         return 0
 
     print("Differences are...")
-    diff_rows.sort(key=lambda t: t[0])
 
     print("SYM  START1      START2      SIZE1       SIZE2       NAME")
     print("---- ----------  ----------  ----------  ----------  ----")
 
-    for addr, sym, st1, st2, s1z, s2z, nm in diff_rows:
+    for (addr, sym, st1, st2, s1z, s2z, nm), cd in zip(diff_rows, cds):
         print(f"{sym:>3}  {st1:<10}  {st2:<10}  {s1z:10d}  {s2z:10d}  {_dn(nm):<{NAME_W}}")
+        if cd is None:
+            continue
+        n1, n2, dec, ranges, err = cd
+        if err:
+            print(f"       ! {err}")
+            continue
+        ch = sum(max(r[2], r[4]) for r in ranges)
+        print(f"       {'decoded' if dec else 'raw'} {n1} -> {n2} bytes, {len(ranges)} range(s), ~{ch} bytes changed")
+        for op, o1, l1, o2, l2 in ranges:
+            print(f"       {op:<7}  {hx(o1)} +{l1:<10d}  {hx(o2)} +{l2:d}")
+
+    return 0
+
+def compare_many(paths, pool=None, use_cache: bool = True):
+    groups = []
+    sizes = []
+    for p in paths:
+        with PckFile(p) as pf:
+            if len(pf) < 92:
+                raise ValueError(f"{p}: too small")
+            secs, _, dig = load_sections_digests(pf.data, p, pool, use_cache)
+            groups.append(_group_sections(secs, dig))
+            sizes.append(len(pf))
+    keys = sorted(set().union(*groups))
+    rows = []
+    for sym, name in keys:
+        ls = [g.get((sym, name), ()) for g in groups]
+        for i in range(max(len(l) for l in ls)):
+            cells = [l[i] if i < len(l) else None for l in ls]
+            ids = {}
+            marks = ""
+            for c in cells:
+                if c is None:
+                    marks += "-"
+                else:
+                    k = (c[1] - c[0], c[2])
+                    if k not in ids:
+                        ids[k] = chr(65 + len(ids)) if len(ids) < 26 else "?"
+                    marks += ids[k]
+            addr = next(c[0] for c in cells if c is not None)
+            nm = name if i == 0 else f"{name}#{i}"
+            rows.append((addr, sym, nm, cells, marks))
+    rows.sort(key=lambda t: t[0])
+    return rows, sizes
+
+def _pairwise(rows, n: int):
+    pair = [[0] * n for _ in range(n)]
+    for *_, marks in rows:
+        if marks.count(marks[0]) == n:
+            continue
+        for i in range(n):
+            for j in range(i + 1, n):
+                if marks[i] != marks[j]:
+                    pair[i][j] += 1
+                    pair[j][i] += 1
+    return pair
+
+def _matrix_rec(row):
+    addr, sym, nm, cells, marks = row
+    return {"sym": sym, "start": addr, "name": nm, "marks": marks, "cells": [None if c is None else {"start": c[0], "size": c[1] - c[0], "digest": c[2]} for c in cells]}
+
+def _compare_matrix(paths, pool=None, use_cache: bool = True, show_all: bool = False, fmt: str = "text") -> int:
+    try:
+        rows, sizes = compare_many(paths, pool, use_cache)
+    except ValueError as e:
+        print(e)
+        return 1
+    n = len(paths)
+    pair = _pairwise(rows, n)
+    if fmt != "text":
+        sel = (r for r in rows if show_all or r[4].count(r[4][0]) != n)
+        packs = [{"index": i + 1, "file": p, "size": z} for i, (p, z) in enumerate(zip(paths, sizes))]
+        if fmt == "json":
+            _emit_json({"packs": packs, "pairwise": pair, "sections": map(_matrix_rec, sel)})
+        elif fmt == "ndjson":
+            for p in packs:
+                _emit_ndjson({"kind": "pack", **p})
+            for r in sel:
+                _emit_ndjson({"kind": "section", **_matrix_rec(r)})
+            _emit_ndjson({"kind": "pairwise", "matrix": pair})
+        else:
+            cols = [f"P{i + 1}" for i in range(n)]
+            _emit_csv(({"sym": sym, "start": addr, "name": nm, **dict(zip(cols, marks))} for addr, sym, nm, cells, marks in sel), ("sym", "start", "name", *cols))
+        return 0
+
+    print("==== PCK Compare (matrix) ====")
+    for i, (p, z) in enumerate(zip(paths, sizes)):
+        print(f"P{i + 1}: {p}  size={z} ({hx(z)})")
+    print()
+
+    w = max(3, len(str(n)) + 1)
+    hdr = "".join(f"{'P' + str(i + 1):>{w}}" for i in range(n))
+    pw = max(len(str(n)) + 1, *(len(str(v)) for r in pair for v in r)) + 2
+    print("Differing sections (pairwise)")
+    print(f"{'':>{pw}}" + "".join(f"{'P' + str(i + 1):>{pw}}" for i in range(n)))
+    for i in range(n):
+        print(f"{'P' + str(i + 1):>{pw}}" + "".join(f"{pair[i][j]:>{pw}}" for j in range(n)))
+    print()
+
+    diff = [r for r in rows if show_all or r[4].count(r[4][0]) != n]
+    if not diff:
+        print("They are identical!")
+        return 0
+
+    print("Sections (same letter = same content, - = absent)")
+    print(f"SYM  START1      {hdr}  NAME")
+    print(f"---- ----------  {'-' * (w * n)}  ----")
+    for addr, sym, nm, cells, marks in diff:
+        st = hx(cells[0][0]) if cells[0] is not None else "-"
+        print(f"{sym:>3}  {st:<10}  " + "".join(f"{m:>{w}}" for m in marks) + f"  {_dn(nm):<{NAME_W}}")
+    print()
+    print("vs P1: " + "  ".join(f"P{j + 1}={pair[0][j]}" for j in range(1, n)))
+    return 0
+
+def _parse_query(tok: str):
+    a, sep, b = tok.partition(":")
+    a, b = int(a, 0), int(b, 0) if sep else None
+    if a < 0 or (b is not None and b < 0):
+        raise ValueError(f"negative offset {tok}")
+    return a, b
+
+def locate_offsets(pck_path: str, queries, jobs: int = 1, use_cache: bool = True, show_all: bool = False, fmt: str = "text") -> int:
+    if not os.path.exists(pck_path):
+        print("not found")
+        return 2
+    try:
+        qs = [_parse_query(q) for q in queries]
+    except ValueError as e:
+        print(f"bad offset: {e}")
+        return 2
+    pool = make_pool(jobs)
+    try:
+        with PckFile(pck_path) as pf:
+            n = len(pf)
+            if n < 92:
+                print("too small")
+                return 1
+            secs, meta = load_sections(pf.data, pck_path, pool, use_cache)
+    finally:
+        if pool is not None:
+            pool.shutdown()
+    with stage("interval_index", calls=len(secs)):
+        idx = IntervalIndex(secs)
+    with stage("locate", calls=len(qs)):
+        hits = iter(idx.at_many([a for a, b in qs if b is None]))
+        res = [(a, b, next(hits) if b is None else idx.overlapping(a, b)) for a, b in qs]
+
+    def recs():
+        for a, b, ids in res:
+            if b is None and not show_all:
+                ids = ids[:1]
+            q = hx(a) if b is None else f"{hx(a)}:{hx(b)}"
+            yield q, a, b, [dict(_sec_rec(secs[i]), delta=a - secs.start[i]) for i in ids]
+
+    if fmt == "json":
+        _emit_json({"file": pck_path, "size": n, "results": ({"query": q, "offset": a, "end": b, "sections": ss} for q, a, b, ss in recs())})
+        return 0
+    if fmt == "csv":
+        _emit_csv(({"query": q, **r} for q, a, b, ss in recs() for r in (ss or [{}])), ("query", "sym", "start", "end", "size", "delta", "name"))
+        return 0
+
+    st, en = secs.start, secs.end
+    frag = {}
+    if fmt == "ndjson":
+        enc = json.JSONEncoder(ensure_ascii=False).encode
+
+        def line(q, a, b, ids):
+            ss = []
+            for i in ids:
+                r = frag.get(i)
+                if r is None:
+                    r = frag[i] = _sec_rec(secs[i])
+                ss.append({**r, "delta": a - st[i]})
+            return enc({"query": q, "offset": a, "end": b, "sections": ss})
+    else:
+        w = max([10] + [21 for a, b in qs if b is not None])
+
+        def line(q, a, b, ids):
+            if not ids:
+                return f"{q:<{w}}  {'-':>3}  (outside pack, size={hx(n)})"
+            rows = []
+            for i in ids:
+                f = frag.get(i)
+                if f is None:
+                    f = frag[i] = (f"  {chr(secs.sym[i]):>3}  {hx(st[i]):<10}  {hx(en[i] - 1):<10}  ", f"  {secs.name(i)}")
+                d = a - st[i]
+                rows.append(f"{q:<{w}}{f[0]}{hx(d) if d >= 0 else '-':<10}{f[1]}")
+            return "\n".join(rows)
+
+        print(f"{'QUERY':<{w}}  {'SYM':>3}  {'START':<10}  {'LAST':<10}  {'DELTA':<10}  NAME")
+        print(f"{'-'*w}  {'-'*3}  {'-'*10}  {'-'*10}  {'-'*10}  {'-'*NAME_W}")
+    out = []
+    miss = 0
+    for a, b, ids in res:
+        if b is None and not show_all:
+            ids = ids[:1]
+        miss += not ids
+        out.append(line(hx(a) if b is None else f"{hx(a)}:{hx(b)}", a, b, ids))
+        if len(out) >= 4096:
+            sys.stdout.write("\n".join(out) + "\n")
+            out.clear()
+    if out:
+        sys.stdout.write("\n".join(out) + "\n")
+    if fmt == "text":
+        print(f"queries: {len(res)}  unmatched: {miss}")
+    return 0
+
+def build_locate_parser():
+    p = argparse.ArgumentParser(
+        prog="ssd.py locate",
+        description="map byte offsets (or START:END ranges) to the sections that contain them",
+    )
+    p.add_argument("pck", help="input .pck")
+    p.add_argument("queries", nargs="*", metavar="OFFSET", help="offset (0x.. or decimal) or START:END (end exclusive)")
+    p.add_argument("-f", "--from", dest="from_file", metavar="FILE", help="read more offsets/ranges from FILE (- = stdin), whitespace or comma separated")
+    p.add_argument("-a", "--all", action="store_true", help="list every section containing an offset, innermost first")
+    p.add_argument("--format", choices=FORMATS, default="text")
+    p.add_argument("-j", "--jobs", type=int, default=1, metavar="N")
+    p.add_argument("--no-cache", action="store_true", help="do not use the section-map index cache")
+    return p
+
+PATCH_MAGIC = b"SSDP"
+PATCH_VERSION = 1
+PATCH_HDR = struct.Struct("<4sHI")
+PATCH_CHUNK = 1024 * 1024
+PATCH_SPOOL = 64 * 1024 * 1024
+
+def _sha256(data) -> str:
+    h = hashlib.sha256()
+    with stage("sha256", len(data)):
+        for p in range(0, len(data), PATCH_CHUNK):
+            h.update(data[p:p + PATCH_CHUNK])
+    return h.hexdigest()
+
+def _pair_sections(s1, s2):
+    g1 = {}
+    for i, (sym, k) in enumerate(zip(s1.sym, s1.nid)):
+        g1.setdefault((sym, s1.names[k]), []).append(i)
+    seen = {}
+    pair = array("q")
+    for sym, k in zip(s2.sym, s2.nid):
+        key = (sym, s2.names[k])
+        c = seen[key] = seen.get(key, -1) + 1
+        l1 = g1.get(key, ())
+        pair.append(l1[c] if c < len(l1) else -1)
+    return pair
+
+def plan_patch(d1, d2, p1: str, p2: str, pool=None, use_cache: bool = True):
+    s1, _, h1 = load_sections_digests(d1, p1, pool, use_cache)
+    s2, _, h2 = load_sections_digests(d2, p2, pool, use_cache)
+
+    with stage("patch_plan", calls=len(s2)):
+        pair = _pair_sections(s1, s2)
+        idx = IntervalIndex(s2)
+        segs = [(idx.bounds[k], idx.bounds[k + 1], idx.ids[idx.off[k]]) for k in range(len(idx)) if idx.off[k + 1] > idx.off[k]]
+        owned = sorted({j for a, b, j in segs})
+        changed = [j for j in owned if pair[j] >= 0 and h1[pair[j]] != h2[j]]
+
+    items = [(p2, chr(s2.sym[j]), s1.start[pair[j]], s1.end[pair[j]], s2.start[j], s2.end[j], False) for j in changed]
+    if pool is None:
+        res = [_chunk_diff_item(d1, d2, *it[1:]) for it in items]
+    else:
+        res = list(pool_map(pool, _w_chunk_diff, p1, items, lambda c: [_chunk_diff_item(d1, d2, *it[1:]) for it in c], 1))
+    diffs = dict(zip(changed, res))
+
+    def section_ops(j):
+        i = pair[j]
+        n = s2.end[j] - s2.start[j]
+        if i < 0:
+            return [(0, n, -1)]
+        a1 = s1.start[i]
+        if h1[i] == h2[j]:
+            return [(0, n, a1)]
+        cd = diffs.get(j)
+        if cd is None or cd[4]:
+            return [(0, n, -1)]
+        ops = []
+        e1 = e2 = 0
+        for op, o1, l1, o2, l2 in cd[3]:
+            if o2 > e2:
+                ops.append((e2, o2 - e2, a1 + e1))
+            if l2:
+                ops.append((o2, l2, -1))
+            e1, e2 = o1 + l1, o2 + l2
+        if n > e2:
+            ops.append((e2, n - e2, a1 + e1))
+        return ops
+
+    ops = []
+
+    def emit(src: int, n: int):
+        if ops:
+            last = ops[-1]
+            if (src < 0 and last[0] < 0) or (src >= 0 and last[0] >= 0 and last[0] + last[1] == src):
+                last[1] += n
+                return
+        ops.append([src, n])
+
+    with stage("patch_plan", calls=len(segs)):
+        cache = {}
+        pos = 0
+        for a, b, j in segs:
+            if a > pos:
+                emit(-1, a - pos)
+            c = cache.get(j)
+            if c is None:
+                so = section_ops(j)
+                c = cache[j] = (so, [r for r, n, src in so])
+            so, rs = c
+            a2 = s2.start[j]
+            ra, rb = a - a2, b - a2
+            for r, n, src in so[max(0, bisect.bisect_right(rs, ra) - 1):]:
+                if r >= rb:
+                    break
+                lo, hi = max(r, ra), min(r + n, rb)
+                if hi > lo:
+                    emit(-1 if src < 0 else src + lo - r, hi - lo)
+            pos = b
+        if len(d2) > pos:
+            emit(-1, len(d2) - pos)
+
+    stats = {
+        "total": len(s2),
+        "unchanged": sum(1 for j, i in enumerate(pair) if i >= 0 and h1[i] == h2[j]),
+        "changed": sum(1 for j, i in enumerate(pair) if i >= 0 and h1[i] != h2[j]),
+        "added": sum(1 for i in pair if i < 0),
+        "removed": len(s1) - sum(1 for i in pair if i >= 0),
+    }
+    return ops, stats
+
+def write_patch(d1, d2, p1: str, p2: str, dest: str, pool=None, use_cache: bool = True, level: int = 9):
+    ops, stats = plan_patch(d1, d2, p1, p2, pool, use_cache)
+    z = zlib.compressobj(level)
+    h = hashlib.sha256()
+    raw = 0
+    with tempfile.SpooledTemporaryFile(PATCH_SPOOL) as tmp:
+        pos = 0
+        for src, n in ops:
+            if src < 0:
+                with stage("patch_compress", n):
+                    for p in range(pos, pos + n, PATCH_CHUNK):
+                        c = z.compress(d2[p:min(pos + n, p + PATCH_CHUNK)])
+                        h.update(c)
+                        tmp.write(c)
+                raw += n
+            pos += n
+        c = z.flush()
+        h.update(c)
+        tmp.write(c)
+        m = {
+            "format": "ssd-patch",
+            "version": PATCH_VERSION,
+            "base": {"file": os.path.basename(p1), "size": len(d1), "sha256": _sha256(d1)},
+            "new": {"file": os.path.basename(p2), "size": len(d2), "sha256": _sha256(d2)},
+            "data": {"codec": "zlib", "size": tmp.tell(), "raw": raw, "sha256": h.hexdigest()},
+            "sections": stats,
+            "ops": ops,
+        }
+        mb = json.dumps(m, separators=(",", ":")).encode("utf-8")
+        part = dest + ".part"
+        with stage("write", PATCH_HDR.size + len(mb) + tmp.tell()), open(part, "wb") as f:
+            f.write(PATCH_HDR.pack(PATCH_MAGIC, PATCH_VERSION, len(mb)))
+            f.write(mb)
+            tmp.seek(0)
+            shutil.copyfileobj(tmp, f, PATCH_CHUNK)
+        os.replace(part, dest)
+    m["size"] = PATCH_HDR.size + len(mb) + m["data"]["size"]
+    return m
+
+def read_patch_manifest(f):
+    hdr = f.read(PATCH_HDR.size)
+    if len(hdr) < PATCH_HDR.size or hdr[:4] != PATCH_MAGIC:
+        raise ValueError("not an ssd patch")
+    magic, ver, mlen = PATCH_HDR.unpack(hdr)
+    if ver != PATCH_VERSION:
+        raise ValueError(f"unsupported patch version {ver}")
+    return json.loads(f.read(mlen).decode("utf-8"))
+
+class _PatchData:
+    def __init__(self, f, size: int):
+        self.f = f
+        self.left = size
+        self.z = zlib.decompressobj()
+        self.h = hashlib.sha256()
+
+    def read(self, n: int) -> bytes:
+        parts = []
+        while n > 0:
+            src = self.z.unconsumed_tail
+            if not src:
+                src = self.f.read(min(PATCH_CHUNK, self.left))
+                if not src:
+                    raise ValueError("patch data truncated")
+                self.left -= len(src)
+                self.h.update(src)
+            b = self.z.decompress(src, n)
+            n -= len(b)
+            parts.append(b)
+        return b"".join(parts)
+
+    def finish(self) -> str:
+        while self.left:
+            src = self.f.read(min(PATCH_CHUNK, self.left))
+            if not src:
+                raise ValueError("patch data truncated")
+            self.left -= len(src)
+            self.h.update(src)
+            if self.z.decompress(src, 1):
+                raise ValueError("patch data longer than its ops")
+        return self.h.hexdigest()
+
+def apply_patch(base_path: str, patch_path: str, out_path: str, verify: bool = True):
+    with open(patch_path, "rb") as f, PckFile(base_path) as pb:
+        m = read_patch_manifest(f)
+        base = pb.data
+        if len(base) != m["base"]["size"] or (verify and _sha256(base) != m["base"]["sha256"]):
+            raise ValueError("base pack does not match the patch")
+        src = _PatchData(f, m["data"]["size"])
+        h = hashlib.sha256()
+        part = out_path + ".part"
+        try:
+            with open(part, "wb") as out:
+                for s, n in m["ops"]:
+                    if s >= 0 and s + n > len(base):
+                        raise ValueError("copy op outside the base pack")
+                    with stage("patch_apply", n):
+                        for p in range(0, n, PATCH_CHUNK):
+                            k = min(PATCH_CHUNK, n - p)
+                            b = src.read(k) if s < 0 else base[s + p:s + p + k]
+                            h.update(b)
+                            out.write(b)
+                size = out.tell()
+            if src.finish() != m["data"]["sha256"]:
+                raise ValueError("patch data checksum mismatch")
+            if size != m["new"]["size"] or h.hexdigest() != m["new"]["sha256"]:
+                raise ValueError("rebuilt pack checksum mismatch")
+        except BaseException:
+            with contextlib.suppress(OSError):
+                os.remove(part)
+            raise
+        os.replace(part, out_path)
+    return m
+
+def diff_pcks(p1: str, p2: str, dest: str, jobs: int = 1, use_cache: bool = True, level: int = 9, fmt: str = "text") -> int:
+    if not (os.path.exists(p1) and os.path.exists(p2)):
+        print("not found")
+        return 2
+    pool = make_pool(jobs)
+    try:
+        with PckFile(p1) as f1, PckFile(p2) as f2:
+            if len(f1) < 92 or len(f2) < 92:
+                print("too small")
+                return 1
+            m = write_patch(f1.data, f2.data, p1, p2, dest, pool, use_cache, level)
+    finally:
+        if pool is not None:
+            pool.shutdown()
+    ops = m.pop("ops")
+    copied = sum(n for s, n in ops if s >= 0)
+    if fmt == "json":
+        _emit_json({"patch": dest, **m, "ops": len(ops), "copied": copied})
+        return 0
+    st, d = m["sections"], m["data"]
+    print("==== PCK Diff ====")
+    print(f"base: {p1}  size={m['base']['size']} ({hx(m['base']['size'])})")
+    print(f"new:  {p2}  size={m['new']['size']} ({hx(m['new']['size'])})")
+    print(f"sections: {st['total']}  unchanged: {st['unchanged']}  changed: {st['changed']}  added: {st['added']}  removed: {st['removed']}")
+    print(f"ops: {len(ops)}  copied: {copied} bytes  data: {d['raw']} bytes -> {d['size']} compressed")
+    print(f"patch: {dest}  {m['size']} bytes ({100.0 * m['size'] / max(1, m['new']['size']):.2f}% of new)")
+    return 0
+
+def patch_pck(base_path: str, patch_path: str, out_path: str, verify: bool = True) -> int:
+    if not (os.path.exists(base_path) and os.path.exists(patch_path)):
+        print("not found")
+        return 2
+    try:
+        m = apply_patch(base_path, patch_path, out_path, verify)
+    except (ValueError, KeyError, zlib.error) as e:
+        print(f"patch failed: {e}")
+        return 1
+    print(f"{out_path}: {m['new']['size']} bytes, sha256 {m['new']['sha256']} ok")
+    return 0
+
+def build_diff_parser():
+    p = argparse.ArgumentParser(
+        prog="ssd.py diff",
+        description="write a patch that rebuilds NEW from BASE (changed/added sections only, zlib-compressed)",
+    )
+    p.add_argument("base", help="base .pck")
+    p.add_argument("new", help="new .pck")
+    p.add_argument("-o", "--output", required=True, metavar="PATCH", help="patch file to write")
+    p.add_argument("--level", type=int, default=9, choices=range(10), metavar="0-9", help="zlib level (default: 9)")
+    p.add_argument("--format", choices=("text", "json"), default="text")
+    p.add_argument("-j", "--jobs", type=int, default=1, metavar="N")
+    p.add_argument("--no-cache", action="store_true", help="do not use the section-map index cache")
+    return p
+
+def build_patch_parser():
+    p = argparse.ArgumentParser(
+        prog="ssd.py patch",
+        description="rebuild the new pack from BASE and a patch written by `ssd.py diff`",
+    )
+    p.add_argument("base", help="base .pck")
+    p.add_argument("patch", help="patch file")
+    p.add_argument("-o", "--output", required=True, metavar="PCK", help="rebuilt .pck to write")
+    p.add_argument("--no-verify", action="store_true", help="skip the sha256 check of the base pack (size is still checked)")
+    return p
+
+def _w_resource(path: str, a: int, b: int) -> bytes:
+    return decrypt_and_decompress_resource_safe(bytearray(_w_data(path)[a:b]))[1]
 
+HTTP_CHUNK = 1024 * 1024
+HTTP_REASONS = {200: "OK", 206: "Partial Content", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed", 416: "Range Not Satisfiable", 431: "Request Header Fields Too Large", 500: "Internal Server Error"}
+
+def _parse_range(h: str, size: int):
+    m = re.fullmatch(r"\s*bytes\s*=\s*(\d*)\s*-\s*(\d*)\s*", h or "")
+    if not m or (not m.group(1) and not m.group(2)):
+        return None
+    if not m.group(1):
+        k = int(m.group(2))
+        if k == 0:
+            return False
+        return max(0, size - k), size
+    a = int(m.group(1))
+    if m.group(2) and int(m.group(2)) < a:
+        return None
+    if a >= size:
+        return False
+    b = int(m.group(2)) + 1 if m.group(2) else size
+    return a, min(b, size)
+
+class PckServer:
+    def __init__(self, archive: PckArchive, pool=None):
+        self.ar = archive
+        self.pool = pool
+        self._map = None
+
+    def map_json(self) -> bytes:
+        if self._map is None:
+            ar = self.ar
+            doc = {
+                "file": ar.path,
+                "size": len(ar.data),
+                "meta": ar.meta,
+                "sections": [_sec_rec(x) for x in ar.sections],
+            }
+            self._map = json.dumps(doc, ensure_ascii=False).encode("utf-8")
+        return self._map
+
+    async def _decoded(self, a: int, b: int) -> bytes:
+        payload = self.ar._lru_get((a, b))
+        if payload is None:
+            loop = asyncio.get_running_loop()
+            if self.pool is not None:
+                payload = await loop.run_in_executor(self.pool, _w_resource, self.ar.path, a, b)
+            else:
+                payload = await loop.run_in_executor(None, lambda: decrypt_and_decompress_resource_safe(bytearray(self.ar.data[a:b]))[1])
+            self.ar._lru_put((a, b), payload)
+        return payload
+
+    async def _respond(self, w, status: int, body=b"", ctype="application/octet-stream", extra=(), head=False, keep=True):
+        hdr = [f"HTTP/1.1 {status} {HTTP_REASONS.get(status, '')}", f"Content-Type: {ctype}", f"Content-Length: {len(body)}", "Accept-Ranges: bytes"]
+        hdr += list(extra)
+        hdr.append("Connection: keep-alive" if keep else "Connection: close")
+        w.write(("\r\n".join(hdr) + "\r\n\r\n").encode("latin-1"))
+        if not head:
+            for o in range(0, len(body), HTTP_CHUNK):
+                w.write(body[o:o + HTTP_CHUNK])
+                await w.drain()
+        await w.drain()
+
+    async def _handle_one(self, method: str, target: str, headers, w, keep: bool):
+        if method not in ("GET", "HEAD"):
+            return await self._respond(w, 405, b"method not allowed\n", "text/plain", ("Allow: GET, HEAD",), keep=keep)
+        head = method == "HEAD"
+        u = urllib.parse.urlsplit(target)
+        path = urllib.parse.unquote(u.path)
+        q = urllib.parse.parse_qs(u.query)
+        if path in ("/", "/map"):
+            return await self._respond(w, 200, self.map_json(), "application/json; charset=utf-8", head=head, keep=keep)
+        for prefix in ("/raw/", "/decoded/"):
+            if path.startswith(prefix):
+                break
+        else:
+            return await self._respond(w, 404, b"not found\n", "text/plain", head=head, keep=keep)
+        name = path[len(prefix):]
+        try:
+            index = int(q.get("index", ["0"])[0])
+            a, b, sym = self.ar.find(name, q.get("sym", [None])[0], index)
+        except KeyError:
+            return await self._respond(w, 404, b"no such section\n", "text/plain", head=head, keep=keep)
+        except ValueError as e:
+            return await self._respond(w, 400, f"bad query: {e}\n".encode("utf-8"), "text/plain", head=head, keep=keep)
+        if prefix == "/raw/":
+            body = self.ar.data[a:b]
+        elif sym not in ("O", "D"):
+            return await self._respond(w, 400, b"section is not an encrypted resource\n", "text/plain", head=head, keep=keep)
+        else:
+            try:
+                body = await self._decoded(a, b)
+            except Exception as e:
+                return await self._respond(w, 500, f"decode failed: {e}\n".encode("utf-8"), "text/plain", head=head, keep=keep)
+        extra = [f"X-Section: {sym} {a} {b}"]
+        rng = headers.get("range")
+        if rng:
+            r = _parse_range(rng, len(body))
+            if r is False:
+                return await self._respond(w, 416, b"", extra=(f"Content-Range: bytes */{len(body)}",), head=head, keep=keep)
+            if r is not None:
+                ra, rb = r
+                extra.append(f"Content-Range: bytes {ra}-{rb - 1}/{len(body)}")
+                return await self._respond(w, 206, body[ra:rb], extra=extra, head=head, keep=keep)
+        await self._respond(w, 200, body, extra=extra, head=head, keep=keep)
+
+    async def handle(self, r, w):
+        try:
+            while True:
+                try:
+                    line = await r.readline()
+                except ValueError:
+                    await self._respond(w, 400, b"request line too long\n", "text/plain", keep=False)
+                    break
+                if not line:
+                    break
+                parts = line.decode("latin-1").split()
+                headers = {}
+                try:
+                    while True:
+                        h = await r.readline()
+                        if h in (b"\r\n", b"\n", b""):
+                            break
+                        k, _, v = h.decode("latin-1").partition(":")
+                        headers[k.strip().lower()] = v.strip()
+                except ValueError:
+                    await self._respond(w, 431, b"header too long\n", "text/plain", keep=False)
+                    break
+                if len(parts) != 3:
+                    await self._respond(w, 400, b"bad request\n", "text/plain", keep=False)
+                    break
+                method, target, ver = parts
+                keep = ver == "HTTP/1.1" and headers.get("connection", "").lower() != "close"
+                await self._handle_one(method, target, headers, w, keep)
+                if not keep:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, asyncio.LimitOverrunError):
+            pass
+        finally:
+            try:
+                w.close()
+                await w.wait_closed()
+            except (ConnectionError, OSError):
+                pass
+
+    async def serve(self, host: str, port: int, ready=None):
+        srv = await asyncio.start_server(self.handle, host, port)
+        addr = srv.sockets[0].getsockname()
+        print(f"serving {self.ar.path} on http://{addr[0]}:{addr[1]}/ (map, raw/NAME, decoded/NAME)", flush=True)
+        if ready is not None:
+            ready(addr)
+        async with srv:
+            await srv.serve_forever()
+
+def serve_pck(pck_path: str, host: str = "127.0.0.1", port: int = 8080, jobs: int = 0, use_cache: bool = True, cache_bytes: int = ARCHIVE_CACHE_BYTES) -> int:
+    if not os.path.exists(pck_path):
+        print("not found")
+        return 2
+    jobs = jobs or os.cpu_count() or 1
+    pool = make_pool(jobs)
+    ar = PckArchive(pck_path, use_cache, cache_bytes, pool)
+    try:
+        ar.sections
+        asyncio.run(PckServer(ar, pool).serve(host, port))
+    except ValueError as e:
+        print(e)
+        return 1
+    except KeyboardInterrupt:
+        pass
+    finally:
+        ar.close()
+        if pool is not None:
+            pool.shutdown()
     return 0
 
+def build_serve_parser():
+    p = argparse.ArgumentParser(
+        prog="ssd.py serve",
+        description="serve a pack over HTTP: GET /map (JSON), /raw/NAME, /decoded/NAME (?sym=X&index=N, Range supported)",
+    )
+    p.add_argument("pck", help="input .pck")
+    p.add_argument("--host", default="127.0.0.1")
+    p.add_argument("--port", type=int, default=8080)
+    p.add_argument("-j", "--jobs", type=int, default=0, metavar="N", help="decode worker processes (default: CPU count; 1 = threads)")
+    p.add_argument("--cache-mb", type=int, default=ARCHIVE_CACHE_BYTES // (1024 * 1024), help="decoded-entry LRU size")
+    p.add_argument("--no-cache", action="store_true", help="do not use the section-map index cache")
+    p.add_argument("--lzss", choices=sorted(LZSS_BACKENDS))
+    return p
+
+BATCH_FIELDS = ("pack", "op", "status", "size", "seconds", "cpu", "sections", "os_entries", "unused_bytes", "dumped", "failed", "baseline", "diffs", "out", "error")
+
+BATCH_DRIVERS = 4
+
+def _batch_task(op: str, path: str, out: str = None, baseline: str = None, decode: bool = False, use_cache: bool = True, incremental: bool = False, pool=None):
+    t0 = time.perf_counter()
+    c0 = time.thread_time()
+    row = {"pack": path, "op": op, "status": "ok", "error": ""}
+    try:
+        with PckFile(path) as pf:
+            row["size"] = len(pf)
+            if len(pf) < 92:
+                raise ValueError("too small")
+            if op == "map":
+                secs, meta = load_sections(pf.data, path, pool, use_cache)
+                row.update(sections=len(secs), os_entries=meta["os_entries"], unused_bytes=meta["unused_bytes"])
+            elif op == "export":
+                res = export_sections(pf, path, out, pool, decode, use_cache, incremental)
+                row.update(sections=res["total"], dumped=res["dumped"], failed=res["total"] - res["dumped"], out=out, os_entries=res["meta"]["os_entries"])
+                errs = list(res["errors"]) + [(fn, err) for _, fn, _, _, err in res["decoded"] if err]
+                if errs:
+                    row["error"] = f"{len(errs)} failed, first: {errs[0][0]}: {errs[0][1]}"
+            elif op == "compare":
+                row["baseline"] = baseline
+                with PckFile(baseline) as bf:
+                    if len(bf) < 92:
+                        raise ValueError("baseline too small")
+                    row["diffs"] = len(compare_sections(bf.data, pf.data, baseline, path, pool, use_cache))
+            else:
+                raise ValueError(f"unknown op: {op}")
+    except Exception as e:
+        row["status"] = "error"
+        row["error"] = f"{type(e).__name__}: {e}"
+    row["seconds"] = round(time.perf_counter() - t0, 6)
+    row["cpu"] = round(time.thread_time() - c0, 6)
+    return row
+
+def find_packs(paths):
+    out = []
+    for p in paths:
+        if os.path.isdir(p):
+            for root, dirs, files in os.walk(p):
+                dirs.sort()
+                out += [os.path.join(root, f) for f in sorted(files) if f.lower().endswith(".pck")]
+        else:
+            out.append(p)
+    seen = set()
+    return [p for p in out if not (os.path.abspath(p) in seen or seen.add(os.path.abspath(p)))]
+
+def _batch_out_dirs(packs, out_dir: str):
+    used = {}
+    res = {}
+    for p in packs:
+        stem = _sanitize_seg(os.path.splitext(os.path.basename(p))[0])
+        k = used.get(stem.lower(), 0)
+        used[stem.lower()] = k + 1
+        res[p] = os.path.join(out_dir, stem if k == 0 else f"{stem}_{k}")
+    return res
+
+def _write_report(path: str, rows, totals) -> None:
+    if path.lower().endswith(".csv"):
+        with open(path, "w", encoding="utf-8", newline="") as f:
+            w = csv.DictWriter(f, fieldnames=BATCH_FIELDS, extrasaction="ignore")
+            w.writeheader()
+            for r in rows:
+                w.writerow(r)
+    else:
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"totals": totals, "packs": rows}, f, ensure_ascii=False, indent=1)
+
+def run_batch(op: str, paths, out_dir: str = None, baseline: str = None, jobs: int = 0, decode: bool = False, use_cache: bool = True, incremental: bool = False, report: str = None) -> int:
+    packs = find_packs(paths)
+    if baseline is None and op == "compare" and packs:
+        baseline = packs[0]
+    if op == "compare":
+        packs = [p for p in packs if os.path.abspath(p) != os.path.abspath(baseline)]
+        if not os.path.exists(baseline):
+            print(f"baseline not found: {baseline}")
+            return 2
+        with PckFile(baseline) as bf:
+            if len(bf) >= 92 and use_cache:
+                load_sections_digests(bf.data, baseline, None, True)
+    if not packs:
+        print("no packs")
+        return 2
+    if op == "export" and not out_dir:
+        print("export needs -o OUT_DIR")
+        return 2
+    outs = _batch_out_dirs(packs, out_dir) if op == "export" else {}
+    t0 = time.perf_counter()
+    jobs = max(1, jobs or os.cpu_count() or 1)
+    order = sorted(packs, key=lambda p: -(os.path.getsize(p) if os.path.isfile(p) else 0))
+    rows = {}
+    pool = make_pool(jobs)
+    try:
+        if pool is None:
+            for p in order:
+                rows[p] = _batch_task(op, p, outs.get(p), baseline, decode, use_cache, incremental)
+        else:
+            with ThreadPoolExecutor(max_workers=min(len(packs), BATCH_DRIVERS)) as drv:
+                futs = {p: drv.submit(_batch_task, op, p, outs.get(p), baseline, decode, use_cache, incremental, pool) for p in order}
+                for p, fut in futs.items():
+                    rows[p] = fut.result()
+    finally:
+        if pool is not None:
+            pool.shutdown()
+    rows = [rows[p] for p in packs]
+    wall = time.perf_counter() - t0
+    total = sum(r.get("size") or 0 for r in rows)
+    totals = {
+        "op": op,
+        "packs": len(rows),
+        "failed": sum(r["status"] != "ok" for r in rows),
+        "bytes": total,
+        "wall_seconds": round(wall, 6),
+        "cpu_seconds": round(sum(r.get("cpu") or 0 for r in rows), 6),
+        "jobs": jobs,
+        "mb_s": round(total / wall / 1e6, 3) if wall > 0 else None,
+    }
+    if baseline and op == "compare":
+        totals["baseline"] = baseline
+
+    print(f"==== Batch {op} ====")
+    if op == "compare":
+        print(f"baseline: {baseline}")
+    print(f"{'STATUS':<6}  {'SIZE':>12}  {'SECS':>8}  {'DETAIL':<24}  PACK")
+    print(f"{'-'*6}  {'-'*12}  {'-'*8}  {'-'*24}  {'-'*NAME_W}")
+    for r in rows:
+        if r["status"] != "ok":
+            detail = r["error"]
+        elif op == "map":
+            detail = f"secs={r['sections']} os={r['os_entries']}"
+        elif op == "export":
+            detail = f"dumped={r['dumped']}/{r['sections']}"
+        else:
+            detail = "identical" if not r["diffs"] else f"diffs={r['diffs']}"
+        print(f"{r['status']:<6}  {r.get('size') or 0:12d}  {r.get('seconds') or 0:8.3f}  {detail:<24}  {r['pack']}")
+    print(f"packs: {totals['packs']}  failed: {totals['failed']}  bytes: {total}  wall: {wall:.3f}s  jobs: {jobs}")
+    if report:
+        _write_report(report, rows, totals)
+        print(f"report: {report}")
+    return 1 if totals["failed"] else 0
+
+def build_batch_parser():
+    p = argparse.ArgumentParser(
+        prog="ssd.py batch",
+        description="run map/export/compare over many packs with one shared worker pool",
+    )
+    p.add_argument("op", choices=("map", "export", "compare"))
+    p.add_argument("paths", nargs="+", help=".pck files and/or directories (searched recursively)")
+    p.add_argument("-o", "--out-dir", help="export: per-pack subfolders are created here")
+    p.add_argument("-b", "--baseline", help="compare: baseline pack (default: first pack)")
+    p.add_argument("-j", "--jobs", type=int, default=0, metavar="N", help="worker processes (default: CPU count)")
+    p.add_argument("--decode", action="store_true", help="export: decode original_source entries")
+    p.add_argument("--incremental", action="store_true", help="export: only rewrite changed sections")
+    p.add_argument("--report", metavar="FILE", help="write an aggregated report (.json or .csv)")
+    p.add_argument("--trusted", action="store_true", help="lift the per-entry decompressed size cap")
+    p.add_argument("--no-cache", action="store_true", help="do not use the section-map index cache")
+    p.add_argument("--lzss", choices=sorted(LZSS_BACKENDS))
+    return p
+
 def build_parser():
     ep = (
         "examples:\n"
         "  python ssd.py game.pck out_dir\n"
         "  python ssd.py -c 1.pck 2.pck\n"
+        "  python ssd.py -c base.pck b1.pck b2.pck b3.pck\n"
+        "  python ssd.py --list game.pck\n"
+        "  python ssd.py serve game.pck --port 8080\n"
+        "  python ssd.py batch compare base.pck patches/ --report r.csv\n"
+        "  python ssd.py locate game.pck 0x1234 0x2000:0x3000 -f offsets.txt\n"
+        "  python ssd.py diff old.pck new.pck -o update.ssdp\n"
+        "  python ssd.py patch old.pck update.ssdp -o new.pck\n"
         "\n"
         "export mode:\n"
         "  - dumps EVERY section shown in the map.\n"
         "  - output path comes from NAME (slashes create subfolders).\n"
         "  - name conflicts overwrite (no suffixing).\n"
+        "  - --decode writes original_source entries decrypted + decompressed.\n"
+        "  - --include/--exclude/--sym select sections before any decoding or\n"
+        "    writing (globs match the full NAME; prefix re: for a regex).\n"
+        "  - --incremental keeps a manifest in out_dir and only rewrites\n"
+        "    changed sections; stale outputs are removed.\n"
+        "  - --archive out.tar|out.zip|- streams everything into one archive\n"
+        "    in pack order (out_dir is not needed).\n"
+        "\n"
+        "structured output (--format json|ndjson|csv):\n"
+        "  - covers the section map, meta block, export results and compare rows.\n"
+        "  - ndjson emits sections in mapping order (sort by start if needed),\n"
+        "    then a final meta/summary record.\n"
+        "\n"
+        "index cache:\n"
+        "  - section maps are cached per pack (size, mtime, partial hash)\n"
+        "    under $SSD_CACHE_DIR or ~/.cache/ssd; see --no-cache/--clear-cache.\n"
         "\n"
         "compare mode (-c):\n"
         "  - compares sections grouped by (SYM, NAME).\n"
+        "  - with 3+ packs each pack is hashed once and a presence/difference\n"
+        "    matrix is printed (P1 is the baseline).\n"
+        "  - --chunks splits each differing section into content-defined\n"
+        "    chunks (gear rolling hash), aligns them and prints the changed\n"
+        "    byte ranges as offsets into the section (or decoded payload).\n"
     )
     p = argparse.ArgumentParser(
         prog="ssd.py",
@@ -746,26 +3285,218 @@ def build_parser():
     )
     p.add_argument(
         "-c", "--compare",
-        nargs=2,
-        metavar=("PCK1", "PCK2"),
-        help="compare two pck files by mapped sections (grouped by SYM+NAME)",
+        nargs="+",
+        metavar="PCK",
+        help="compare pck files by mapped sections (grouped by SYM+NAME); 3+ files print a matrix",
+    )
+    p.add_argument(
+        "--matrix",
+        action="store_true",
+        help="with -c: print the matrix for every section, including unchanged ones",
+    )
+    p.add_argument(
+        "--chunks",
+        action="store_true",
+        help="with -c on two packs: list changed byte ranges inside each differing section (add --decode to diff decoded original_source payloads)",
+    )
+    p.add_argument(
+        "--lzss",
+        choices=sorted(LZSS_BACKENDS),
+        help="LZSS decoder backend (default: c if built, else fast)",
+    )
+    p.add_argument(
+        "-j", "--jobs",
+        type=int,
+        default=1,
+        metavar="N",
+        help="worker processes for original_source decryption (default: 1)",
+    )
+    p.add_argument(
+        "--decode",
+        action="store_true",
+        help="export original_source entries decrypted + decompressed (export mode)",
+    )
+    p.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="do not read or write the section-map index cache",
+    )
+    p.add_argument(
+        "--clear-cache",
+        action="store_true",
+        help="drop cached section maps (for the given packs, or all) and exit",
+    )
+    p.add_argument(
+        "--incremental",
+        action="store_true",
+        help="export into out_dir itself, rewriting only changed sections (export mode)",
+    )
+    p.add_argument(
+        "-l", "--list",
+        action="store_true",
+        help="print the section map and resource names only; no files are written",
+    )
+    p.add_argument(
+        "--format",
+        choices=FORMATS,
+        help="output format for map/export/compare reports (default: text); ndjson streams sections as they are mapped",
+    )
+    p.add_argument(
+        "--json",
+        action="store_true",
+        help="alias for --format json",
+    )
+    p.add_argument(
+        "--io-threads",
+        type=int,
+        default=IO_THREADS,
+        metavar="N",
+        help=f"writer threads for export (default: {IO_THREADS})",
+    )
+    p.add_argument(
+        "--mem-limit",
+        type=int,
+        default=IO_MEM_LIMIT // (1024 * 1024),
+        metavar="MB",
+        help=f"max buffered bytes queued for writing (default: {IO_MEM_LIMIT // (1024 * 1024)})",
+    )
+    p.add_argument(
+        "--include",
+        action="append",
+        default=[],
+        metavar="PAT",
+        help="only sections whose NAME matches (glob, or re:REGEX); repeatable",
+    )
+    p.add_argument(
+        "--exclude",
+        action="append",
+        default=[],
+        metavar="PAT",
+        help="skip sections whose NAME matches (glob, or re:REGEX); repeatable",
+    )
+    p.add_argument(
+        "--sym",
+        metavar="SYMS",
+        help="only sections with these SYM letters, e.g. FO",
+    )
+    p.add_argument(
+        "--archive",
+        metavar="DEST",
+        help="export into one .tar/.tar.gz/.tar.xz/.zip instead of a directory (- = tar stream on stdout)",
+    )
+    p.add_argument(
+        "--trusted",
+        action="store_true",
+        help=f"trust decompressed sizes: lift the {MAX_DECOMP // (1024 * 1024)} MiB per-entry cap (large entries stream to disk)",
+    )
+    p.add_argument(
+        "--profile",
+        action="store_true",
+        help="print per-stage wall/CPU time, bytes, calls and MB/s to stderr",
+    )
+    p.add_argument(
+        "--trace",
+        metavar="FILE",
+        help="write a Chrome trace-event JSON of all stages (implies --profile)",
     )
     p.add_argument("pck", nargs="?", help="input .pck (export mode)")
     p.add_argument("out_dir", nargs="?", help="output directory (export mode)")
     return p
 
 def main():
+    argv = sys.argv[1:]
+    if argv[:1] == ["serve"]:
+        args = build_serve_parser().parse_args(argv[1:])
+        if args.lzss:
+            set_lzss_backend(args.lzss)
+        return serve_pck(args.pck, args.host, args.port, args.jobs, not args.no_cache, args.cache_mb * 1024 * 1024)
+
+    if argv[:1] == ["locate"]:
+        args = build_locate_parser().parse_args(argv[1:])
+        queries = list(args.queries)
+        if args.from_file:
+            f = sys.stdin if args.from_file == "-" else open(args.from_file, encoding="utf-8")
+            with f:
+                queries += f.read().replace(",", " ").split()
+        return locate_offsets(args.pck, queries, args.jobs, not args.no_cache, args.all, args.format)
+
+    if argv[:1] == ["diff"]:
+        args = build_diff_parser().parse_args(argv[1:])
+        return diff_pcks(args.base, args.new, args.output, args.jobs, not args.no_cache, args.level, args.format)
+
+    if argv[:1] == ["patch"]:
+        args = build_patch_parser().parse_args(argv[1:])
+        return patch_pck(args.base, args.patch, args.output, not args.no_verify)
+
+    if argv[:1] == ["batch"]:
+        args = build_batch_parser().parse_args(argv[1:])
+        if args.lzss:
+            set_lzss_backend(args.lzss)
+        if args.trusted:
+            set_max_decomp(0xFFFFFFFF)
+        return run_batch(
+            args.op, args.paths, args.out_dir, args.baseline, args.jobs,
+            args.decode, not args.no_cache, args.incremental, args.report,
+        )
+
     ap = build_parser()
-    args = ap.parse_args()
+    args = ap.parse_args(argv)
+
+    if args.lzss:
+        set_lzss_backend(args.lzss)
+    if args.trusted:
+        set_max_decomp(0xFFFFFFFF)
+
+    if not (args.profile or args.trace):
+        return _run(ap, args)
+    prof = enable_profiling(bool(args.trace))
+    try:
+        return _run(ap, args)
+    finally:
+        disable_profiling()
+        prof.print_summary()
+        if args.trace:
+            prof.write_trace(args.trace)
+            print(f"trace: {args.trace}", file=sys.stderr)
+
+def _run(ap, args) -> int:
+
+    if args.clear_cache:
+        targets = list(args.compare or []) + ([args.pck] if args.pck else [])
+        if targets:
+            removed = sum(invalidate_cache(p) for p in targets)
+        else:
+            removed = invalidate_cache()
+        print(f"cache: removed {removed} index file(s) from {cache_dir()}")
+        return 0
+
+    fmt = args.format or ("json" if args.json else "text")
 
     if args.compare:
-        return compare_pcks(args.compare[0], args.compare[1])
+        if len(args.compare) < 2:
+            ap.error("-c/--compare needs at least two packs")
+        if args.chunks and (len(args.compare) > 2 or args.matrix):
+            ap.error("--chunks needs exactly two packs and no --matrix")
+        if args.decode and not args.chunks:
+            ap.error("--decode with -c only applies to --chunks")
+        return compare_pcks(*args.compare, jobs=args.jobs, use_cache=not args.no_cache, show_all=args.matrix, fmt=fmt, chunks=args.chunks, decode=args.decode)
+
+    flt = make_filter(args.include, args.exclude, args.sym)
 
-    if not args.pck or not args.out_dir:
+    if args.list and args.pck:
+        return list_sections(args.pck, args.jobs, not args.no_cache, fmt, flt)
+
+    if args.archive and args.incremental:
+        ap.error("--archive cannot be combined with --incremental")
+
+    if not args.pck or not (args.out_dir or args.archive):
         ap.print_help()
         return 2
 
-    return dump_all_sections(args.pck, args.out_dir)
+    return dump_all_sections(
+        args.pck, args.out_dir, args.jobs, args.decode, not args.no_cache, args.incremental,
+        args.io_threads, args.mem_limit * 1024 * 1024, flt, fmt, args.archive,
+    )
 
 if __name__ == "__main__":
     raise SystemExit(main())